@@ -0,0 +1,359 @@
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.models import (
+    Game,
+    GameConfigs,
+    Guess,
+    GuessStatus,
+    GuessType,
+    Ordering,
+    Phrase,
+    Round,
+    RoundConfigs,
+    Team,
+)
+from common.rest.exceptions import ErrorCode
+
+USERNAME: str = "query_budget_checker"
+PASSWORD: str = "query_budget_checker"
+SEEDED_ITEMS: int = 30
+SMALL_PAGE_SIZE: int = 2
+LARGE_PAGE_SIZE: int = SEEDED_ITEMS
+
+
+@dataclass
+class QueryBudget:
+    name: str
+    method: str
+    path: str
+    max_queries: int
+    data: Optional[dict] = None
+    # Listings must issue the same number of queries whatever the page size
+    paginated: bool = False
+    authenticated: bool = True
+    error_code: ErrorCode = ErrorCode.no_error
+
+
+# Ordered, later requests rely on the state left by the earlier ones. Paths are formatted with
+# the ids of the seeded fixtures. Budgets count the authentication query.
+QUERY_BUDGETS: list[QueryBudget] = [
+    QueryBudget(
+        "login",
+        "post",
+        "/api/login/",
+        1,
+        data={"username": USERNAME, "password": PASSWORD},
+        authenticated=False,
+    ),
+    QueryBudget("me", "get", "/api/me/", 1),
+    QueryBudget("list games", "get", "/api/games/", 3, paginated=True),
+    QueryBudget(
+        "create game",
+        "post",
+        "/api/games/",
+        2,
+        data={"name": "g", "phrase_order": 1, "team_order": 1},
+    ),
+    QueryBudget("get game", "get", "/api/games/{game_id}/", 3),
+    QueryBudget(
+        "update game",
+        "put",
+        "/api/games/{game_id}/",
+        3,
+        data={"name": "g", "phrase_order": 1, "team_order": 1},
+    ),
+    QueryBudget("list phrases", "get", "/api/games/{game_id}/phrases/", 4, paginated=True),
+    QueryBudget(
+        "create phrase", "post", "/api/games/{game_id}/phrases/", 4, data={"value": "NEW PHRASE"}
+    ),
+    QueryBudget("get phrase", "get", "/api/games/{game_id}/phrases/{phrase_id}/", 2),
+    QueryBudget("list teams", "get", "/api/games/{game_id}/teams/", 4, paginated=True),
+    QueryBudget("create team", "post", "/api/games/{game_id}/teams/", 3, data={"name": "t"}),
+    QueryBudget("get team", "get", "/api/games/{game_id}/teams/{team_id}/", 2),
+    QueryBudget(
+        "update team", "put", "/api/games/{game_id}/teams/{team_id}/", 3, data={"name": "t"}
+    ),
+    QueryBudget("list rounds", "get", "/api/games/{game_id}/rounds/", 4, paginated=True),
+    QueryBudget(
+        "create round",
+        "post",
+        "/api/games/{game_id}/rounds/",
+        5,
+        data={"name": "r", "starting_team_id": "{team_id}"},
+    ),
+    QueryBudget(
+        "create second round",
+        "post",
+        "/api/games/{game_id}/rounds/",
+        5,
+        data={"name": "r", "starting_team_id": "{team_id}"},
+        error_code=ErrorCode.any_round_still_ongoing,
+    ),
+    QueryBudget("get round", "get", "/api/games/{game_id}/rounds/{round_id}/", 2),
+    QueryBudget(
+        "update round", "put", "/api/games/{game_id}/rounds/{round_id}/", 3, data={"name": "r"}
+    ),
+    QueryBudget(
+        "list guesses",
+        "get",
+        "/api/games/{game_id}/rounds/{ended_round_id}/guesses/",
+        4,
+        paginated=True,
+    ),
+    QueryBudget(
+        "list guesses after",
+        "get",
+        "/api/games/{game_id}/rounds/{ended_round_id}/guesses/?after_id=0",
+        3,
+    ),
+    QueryBudget(
+        "round dashboard", "get", "/api/games/{game_id}/rounds/{ended_round_id}/dashboard/", 5
+    ),
+    QueryBudget(
+        "guess letter",
+        "post",
+        "/api/games/{game_id}/rounds/{new_round_id}/guesses/",
+        5,
+        data={"team_id": "{team_id}", "type": GuessType.letter.value, "value": "A"},
+    ),
+    QueryBudget(
+        "guess wrong phrase",
+        "post",
+        "/api/games/{game_id}/rounds/{new_round_id}/guesses/",
+        5,
+        data={"team_id": "{team_id}", "type": GuessType.phrase.value, "value": "WRONG"},
+    ),
+    QueryBudget(
+        "guess time out",
+        "post",
+        "/api/games/{game_id}/rounds/{new_round_id}/guesses/",
+        5,
+        data={"team_id": "{team_id}", "type": GuessType.timed_out.value},
+    ),
+    QueryBudget(
+        "guess phrase",
+        "post",
+        "/api/games/{game_id}/rounds/{new_round_id}/guesses/",
+        6,
+        data={"team_id": "{team_id}", "type": GuessType.phrase.value, "value": "{new_phrase}"},
+    ),
+    QueryBudget("round events", "get", "/api/games/{game_id}/rounds/{ended_round_id}/events/", 2),
+    QueryBudget("delete phrase", "delete", "/api/games/{game_id}/phrases/{unused_phrase_id}/", 4),
+    QueryBudget("delete round", "delete", "/api/games/{game_id}/rounds/{new_round_id}/", 4),
+    QueryBudget("delete team", "delete", "/api/games/{game_id}/teams/{unused_team_id}/", 4),
+    QueryBudget("delete game", "delete", "/api/games/{game_id}/", 12),
+]
+
+
+@dataclass
+class QueryBudgetResult:
+    budget: QueryBudget
+    status_code: int
+    error_code: int
+    queries: list[dict] = field(default_factory=list)
+    queries_per_page_size: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def query_count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def failures(self) -> list[str]:
+        failures: list[str] = []
+        if self.status_code != 200:
+            failures.append(f"responded with status {self.status_code}")
+        if self.error_code != self.budget.error_code:
+            failures.append(f"responded with code {self.error_code}")
+        if self.query_count > self.budget.max_queries:
+            failures.append(
+                f"{self.query_count} queries, over the budget of {self.budget.max_queries}"
+            )
+        if len(set(self.queries_per_page_size.values())) > 1:
+            failures.append(f"queries grow with the page size: {self.queries_per_page_size}")
+        return failures
+
+
+class RollbackSeededData(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives every API endpoint against seeded data and fails when a request goes over its "
+        "query budget, or when a listing issues more queries for larger pages. Everything "
+        "runs in a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--verbose-sql", action="store_true", help="Print the queries of every request"
+        )
+
+    # The in-process event hub keeps pg_notify calls out of the counts. Budgets are per shard,
+    # new games have to stay in the rolled back transaction on the default one.
+    @override_settings(EVENT_HUB_USE_PG_NOTIFY=False, GAME_SHARDS=[DEFAULT_DB_ALIAS])
+    def handle(self, *args, **options) -> None:
+        results: list[QueryBudgetResult] = []
+        try:
+            with transaction.atomic():
+                client: APIClient = self._create_client()
+                fixtures: dict = self._seed()
+                for budget in QUERY_BUDGETS:
+                    results.append(self._check(client, budget, fixtures))
+                raise RollbackSeededData()
+        except RollbackSeededData:
+            pass
+
+        failed: list[QueryBudgetResult] = [r for r in results if r.failures]
+        for result in results:
+            self._report(result, verbose_sql=options["verbose_sql"] or result in failed)
+        if failed:
+            raise CommandError(f"{len(failed)} of {len(results)} requests failed their budget")
+        self.stdout.write(self.style.SUCCESS(f"All {len(results)} requests are within budget"))
+
+    def _create_client(self) -> APIClient:
+        user: User = User.objects.create_user(username=USERNAME, password=PASSWORD, is_staff=True)
+        client: APIClient = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def _seed(self) -> dict:
+        audit: dict = {"created_by_id": 0, "updated_by_id": 0}
+        configs: dict = GameConfigs(
+            phrase_order=Ordering.ordered, team_order=Ordering.ordered
+        ).to_dict()
+        Game.objects.bulk_create(
+            [Game(name=f"game {i}", configs=configs, **audit) for i in range(SEEDED_ITEMS)]
+        )
+
+        game: Game = Game.objects.create(name="game", configs=configs, **audit)
+        phrases: list[Phrase] = Phrase.objects.bulk_create(
+            [
+                Phrase(game=game, value=f"PHRASE {i}", normalized_value=f"PHRASE {i}", **audit)
+                for i in range(SEEDED_ITEMS + 2)
+            ]
+        )
+        teams: list[Team] = Team.objects.bulk_create(
+            [Team(game=game, name=f"team {i}", **audit) for i in range(SEEDED_ITEMS + 1)]
+        )
+        rounds: list[Round] = Round.objects.bulk_create(
+            [
+                Round(
+                    game=game,
+                    name=f"round {i}",
+                    is_ended=True,
+                    phrase=phrase,
+                    configs=RoundConfigs(team_ids_ordering=[t.id for t in teams]).to_dict(),
+                    **audit,
+                )
+                for i, phrase in enumerate(phrases[:SEEDED_ITEMS])
+            ]
+        )
+        Guess.objects.bulk_create(
+            [
+                Guess(
+                    round=rounds[0],
+                    team=teams[i % len(teams)],
+                    type=GuessType.letter,
+                    status=GuessStatus.wrong,
+                    value="Z",
+                    score=0,
+                    created_by_id=0,
+                )
+                for i in range(SEEDED_ITEMS)
+            ]
+        )
+
+        # The round created through the API gets the first phrase not used by any round
+        new_phrase: Phrase = phrases[SEEDED_ITEMS]
+        return {
+            "game_id": game.id,
+            "phrase_id": phrases[0].id,
+            "unused_phrase_id": phrases[SEEDED_ITEMS + 1].id,
+            "new_phrase": new_phrase.value,
+            "team_id": teams[0].id,
+            "unused_team_id": teams[-1].id,
+            "round_id": rounds[-1].id,
+            "ended_round_id": rounds[0].id,
+            "new_round_id": None,
+        }
+
+    def _check(self, client: APIClient, budget: QueryBudget, fixtures: dict) -> QueryBudgetResult:
+        path: str = budget.path.format(**fixtures)
+        data: Optional[dict] = _format_data(budget.data, fixtures)
+        if not budget.authenticated:
+            client = APIClient()
+
+        queries_per_page_size: dict[int, int] = {}
+        if budget.paginated:
+            for page_size in (SMALL_PAGE_SIZE, LARGE_PAGE_SIZE):
+                response, queries = self._request(
+                    client, budget.method, f"{path}?per_page={page_size}", data
+                )
+                queries_per_page_size[page_size] = len(queries)
+
+        response, queries = self._request(client, budget.method, path, data)
+        # Streamed responses have no code to check
+        error_code: int = getattr(response, "data", {}).get("code", budget.error_code)
+        if budget.name == "create round" and error_code == ErrorCode.no_error:
+            fixtures["new_round_id"] = response.data["data"]["id"]
+        return QueryBudgetResult(
+            budget=budget,
+            status_code=response.status_code,
+            error_code=error_code,
+            queries=queries,
+            queries_per_page_size=queries_per_page_size,
+        )
+
+    def _request(
+        self, client: APIClient, method: str, path: str, data: Optional[dict]
+    ) -> tuple[Any, list[dict]]:
+        with CaptureQueriesContext(connection) as context:
+            response: Any = getattr(client, method)(path, data=data, format="json")
+            if hasattr(response, "streaming_content"):
+                # Closing fires request_finished, which would close the connection mid-transaction
+                request_finished.disconnect(close_old_connections)
+                try:
+                    response.close()
+                finally:
+                    request_finished.connect(close_old_connections)
+        # Views run inside this command's transaction, their atomic blocks become savepoints
+        queries: list[dict] = [q for q in context.captured_queries if not _is_savepoint(q["sql"])]
+        return response, queries
+
+    def _report(self, result: QueryBudgetResult, verbose_sql: bool) -> None:
+        line: str = (
+            f"{result.budget.method.upper():<6} {result.budget.name:<20} "
+            f"{result.query_count:>3}/{result.budget.max_queries:<3} queries"
+        )
+        if result.failures:
+            self.stdout.write(self.style.ERROR(f"{line} FAILED: {'; '.join(result.failures)}"))
+        else:
+            self.stdout.write(line)
+        if verbose_sql:
+            for i, query in enumerate(result.queries, 1):
+                self.stdout.write(f"    {i}. {query['sql']}")
+
+
+def _format_data(data: Optional[dict], fixtures: dict) -> Optional[dict]:
+    if data is None:
+        return None
+    formatted: dict = {}
+    for key, value in data.items():
+        if isinstance(value, str) and value.startswith("{") and value.endswith("}"):
+            value = fixtures[value[1:-1]]
+        formatted[key] = value
+    return formatted
+
+
+def _is_savepoint(sql: str) -> bool:
+    return sql.startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT"))
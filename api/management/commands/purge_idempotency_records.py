@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.rest.idempotency import purge_idempotency_records
+
+
+class Command(BaseCommand):
+    help = "Deletes the responses kept for Idempotency-Key retries once past their TTL."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--loop", action="store_true", help="Keep running every --interval")
+        parser.add_argument(
+            "--interval", type=float, default=3600, help="Seconds between runs, with --loop"
+        )
+
+    def handle(self, *args, **options) -> None:
+        while True:
+            for shard in settings.GAME_SHARDS:
+                deleted: int = purge_idempotency_records(using=shard)
+                self.stdout.write(f"Deleted {deleted} expired records on {shard}")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.rest.rounds.turns import DEFAULT_HORIZON_SECONDS, DEFAULT_REFRESH_SECONDS, TurnTimer
+
+
+class Command(BaseCommand):
+    help = (
+        "Records a timed out guess for every round whose turn outlives the turn_seconds of its "
+        "game, on every shard. Run a single one."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--refresh",
+            type=float,
+            default=DEFAULT_REFRESH_SECONDS,
+            help="Seconds between loads of the upcoming deadlines",
+        )
+        parser.add_argument(
+            "--horizon",
+            type=float,
+            default=DEFAULT_HORIZON_SECONDS,
+            help="Seconds ahead to load the deadlines of",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if not settings.EVENT_HUB_USE_PG_NOTIFY:
+            self.stderr.write(
+                "EVENT_HUB_USE_PG_NOTIFY is off, event streams won't see the timed out guesses"
+            )
+        self.stdout.write(f"Timing turns out on {', '.join(settings.GAME_SHARDS)}")
+        TurnTimer(refresh_seconds=options["refresh"], horizon_seconds=options["horizon"]).run()
@@ -1,19 +1,37 @@
+from typing import Optional
+
 from django.db.models import Sum
 from rest_framework import serializers
 
+from backend.archives import ArchiveUnavailableError, archive_cache
 from backend.models import Game, Guess, Ordering, Phrase, Team
+from common.rest.exceptions import ErrorCode, ErrorCodeException
 from common.rest.serializers import BaseSerializerMixin
 
+# The turn timer checks deadlines every second or so
+MIN_TURN_SECONDS: int = 5
+MAX_TURN_SECONDS: int = 3600
+
 
 class GameCreationSerializer(serializers.Serializer, BaseSerializerMixin):
     name = serializers.CharField(max_length=200)
     phrase_order = serializers.ChoiceField(choices=[o.value for o in Ordering])
     team_order = serializers.ChoiceField(choices=[o.value for o in Ordering])
+    # Left out, they default to those of GameConfigs on creation and are kept on update
+    enforce_turns = serializers.BooleanField(required=False)
+    turn_seconds = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        min_value=MIN_TURN_SECONDS,
+        max_value=MAX_TURN_SECONDS,
+    )
 
 
 class GameSerializer(serializers.ModelSerializer, BaseSerializerMixin):
     phrase_order = serializers.SerializerMethodField()
     team_order = serializers.SerializerMethodField()
+    enforce_turns = serializers.SerializerMethodField()
+    turn_seconds = serializers.SerializerMethodField()
 
     def get_phrase_order(self, obj: Game) -> int:
         return obj.config_object.phrase_order.value
@@ -21,15 +39,23 @@ class GameSerializer(serializers.ModelSerializer, BaseSerializerMixin):
     def get_team_order(self, obj: Game) -> int:
         return obj.config_object.team_order.value
 
+    def get_enforce_turns(self, obj: Game) -> bool:
+        return obj.config_object.enforce_turns
+
+    def get_turn_seconds(self, obj: Game) -> Optional[int]:
+        return obj.config_object.turn_seconds
+
     class Meta:
         model = Game
-        fields = ["id", "name", "phrase_order", "team_order"]
+        fields = ["id", "name", "phrase_order", "team_order", "enforce_turns", "turn_seconds"]
         read_only_fields = ["__all__"]
 
 
 class GameDetailsSerializer(serializers.ModelSerializer, BaseSerializerMixin):
     phrase_order = serializers.SerializerMethodField()
     team_order = serializers.SerializerMethodField()
+    enforce_turns = serializers.SerializerMethodField()
+    turn_seconds = serializers.SerializerMethodField()
     leaderboard = serializers.SerializerMethodField()
 
     def get_phrase_order(self, obj: Game) -> int:
@@ -38,17 +64,26 @@ class GameDetailsSerializer(serializers.ModelSerializer, BaseSerializerMixin):
     def get_team_order(self, obj: Game) -> int:
         return obj.config_object.team_order.value
 
+    def get_enforce_turns(self, obj: Game) -> bool:
+        return obj.config_object.enforce_turns
+
+    def get_turn_seconds(self, obj: Game) -> Optional[int]:
+        return obj.config_object.turn_seconds
+
     def get_leaderboard(self, obj: Game) -> list[dict[str, int]]:
-        return list(
-            Guess.objects.filter(round__game=obj)
-            .values("team_id")
-            .order_by("team_id")
-            .annotate(total_score=Sum("score"))
-        )
+        return get_leaderboard(obj)
 
     class Meta:
         model = Game
-        fields = ["id", "name", "phrase_order", "team_order", "leaderboard"]
+        fields = [
+            "id",
+            "name",
+            "phrase_order",
+            "team_order",
+            "enforce_turns",
+            "turn_seconds",
+            "leaderboard",
+        ]
         read_only_fields = ["__all__"]
 
 
@@ -64,3 +99,17 @@ class TeamSerializer(serializers.ModelSerializer, BaseSerializerMixin):
         model = Team
         fields = ["id", "name"]
         read_only_fields = ["__all__"]
+
+
+def get_leaderboard(game: Game) -> list[dict[str, int]]:
+    if game.archived_at is not None:
+        try:
+            return archive_cache.get(game.id).get_leaderboard()
+        except ArchiveUnavailableError as e:
+            raise ErrorCodeException(ErrorCode.game_archive_unavailable) from e
+    return list(
+        Guess.objects.filter(round__game=game)
+        .values("team_id")
+        .order_by("team_id")
+        .annotate(total_score=Sum("score"))
+    )
@@ -1,14 +1,17 @@
 from typing import Optional
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.transaction import atomic
+from django.db.models import QuerySet
 from rest_framework import generics
 from rest_framework.request import Request
 from rest_framework.response import Response
 
-from backend.models import Game, GameConfigs, Ordering, Phrase, Team
+from backend.archives import delete_archive
+from backend.models import Game, GameConfigs, Ordering, Phrase, Team, normalize_phrase
+from common.dbrouting import AllShardsList, choose_new_game_shard, shard_atomic, use_game_shard
 from common.rest.exceptions import ErrorCode, ErrorCodeException
-from common.rest.views import ActiveUserAPIViewMixin
+from common.rest.views import ActiveUserAPIViewMixin, GameShardViewMixin
 
 from .serializers import (
     GameCreationSerializer,
@@ -20,14 +23,19 @@ from .serializers import (
 
 
 class GamesView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
-    queryset = Game.objects.order_by("-id")
     serializer_class = GameSerializer
 
+    def get_queryset(self):
+        # Newest first. Ids are only ordered within a shard, each starting at its own range
+        queryset: QuerySet = Game.objects.order_by("-created_at", "-id")
+        if len(settings.GAME_SHARDS) == 1:
+            return queryset
+        return AllShardsList(queryset)
+
     def get(self, request: Request, *args, **kwargs) -> Response:
         data: dict = super().get(request, *args, **kwargs).data
         return self.generate_no_error_response(data)
 
-    @atomic
     def post(self, request: Request, *args, **kwargs) -> Response:
         serializer: GameCreationSerializer = GameCreationSerializer(data=request.data)
         serializer.raise_validation_error_if_any()
@@ -36,19 +44,22 @@ class GamesView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
         game_configs: GameConfigs = GameConfigs(
             phrase_order=Ordering(validated_data["phrase_order"]),
             team_order=Ordering(validated_data["team_order"]),
+            enforce_turns=validated_data.get("enforce_turns", False),
+            turn_seconds=validated_data.get("turn_seconds"),
         )
 
         requester: User = request.user
-        Game.objects.create(
-            name=validated_data["name"],
-            created_by_id=requester.id,
-            updated_by_id=requester.id,
-            configs=game_configs.to_dict(),
-        )
+        with use_game_shard(choose_new_game_shard()), shard_atomic():
+            Game.objects.create(
+                name=validated_data["name"],
+                created_by_id=requester.id,
+                updated_by_id=requester.id,
+                configs=game_configs.to_dict(),
+            )
         return self.generate_no_error_response({})
 
 
-class GameView(ActiveUserAPIViewMixin, generics.RetrieveUpdateDestroyAPIView):
+class GameView(GameShardViewMixin, ActiveUserAPIViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = GameDetailsSerializer
 
     def get_object(self) -> Game:
@@ -67,26 +78,34 @@ class GameView(ActiveUserAPIViewMixin, generics.RetrieveUpdateDestroyAPIView):
         serializer.raise_validation_error_if_any()
 
         validated_data: dict = serializer.validated_data
+        game: Game = self.get_object()
+        current_configs: GameConfigs = game.config_object
         game_configs: GameConfigs = GameConfigs(
             phrase_order=Ordering(validated_data["phrase_order"]),
             team_order=Ordering(validated_data["team_order"]),
+            # Turn settings left out stay as they are
+            enforce_turns=validated_data.get("enforce_turns", current_configs.enforce_turns),
+            turn_seconds=validated_data.get("turn_seconds", current_configs.turn_seconds),
         )
 
         requester: User = request.user
-        game: Game = self.get_object()
         game.config_object = game_configs
         game.name = validated_data["name"]
         game.updated_by_id = requester.id
-        game.save()
+        # Not archived_at, which the archiver may have set since the game was read
+        game.save(update_fields=["name", "configs", "updated_by_id", "updated_at"])
         return self.generate_no_error_response({})
 
     def delete(self, request, *args, **kwargs) -> Response:
         game: Game = self.get_object()
+        game_id: int = game.id
         game.delete()
+        if game.archived_at is not None:
+            delete_archive(game_id)
         return self.generate_no_error_response({})
 
 
-class PhrasesView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
+class PhrasesView(GameShardViewMixin, ActiveUserAPIViewMixin, generics.ListCreateAPIView):
     serializer_class = PhraseSerializer
 
     def get_queryset(self):
@@ -100,28 +119,38 @@ class PhrasesView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
         data: dict = super().get(request, *args, **kwargs).data
         return self.generate_no_error_response(data)
 
-    @atomic
+    @shard_atomic
     def post(self, request: Request, *args, **kwargs) -> Response:
         game_id: int = self.kwargs["game_id"]
-        game: Optional[Game] = Game.objects.filter(id=game_id).first()
+        # Locked against the archiver, which deletes the rows of the game once it has written them
+        game: Optional[Game] = (
+            Game.objects.select_for_update(no_key=True).filter(id=game_id).first()
+        )
         if game is None:
             raise ErrorCodeException(ErrorCode.resource_not_found)
+        if game.archived_at is not None:
+            raise ErrorCodeException(ErrorCode.game_archived)
 
         serializer: PhraseSerializer = self.get_serializer(data=request.data)
         serializer.raise_validation_error_if_any()
 
         requester: User = request.user
         validated_data: dict = serializer.validated_data
-        Phrase.objects.create(
+        # A phrase the game already has isn't added again, its id is returned instead
+        normalized_value: str = normalize_phrase(validated_data["value"])
+        phrase, _ = Phrase.objects.get_or_create(
             game=game,
-            value=validated_data["value"].upper(),
-            created_by_id=requester.id,
-            updated_by_id=requester.id,
+            normalized_value=normalized_value,
+            defaults={
+                "value": normalized_value,
+                "created_by_id": requester.id,
+                "updated_by_id": requester.id,
+            },
         )
-        return self.generate_no_error_response({})
+        return self.generate_no_error_response({"id": phrase.id})
 
 
-class PhraseView(ActiveUserAPIViewMixin, generics.RetrieveDestroyAPIView):
+class PhraseView(GameShardViewMixin, ActiveUserAPIViewMixin, generics.RetrieveDestroyAPIView):
     serializer_class = PhraseSerializer
 
     def get_object(self) -> Phrase:
@@ -142,7 +171,7 @@ class PhraseView(ActiveUserAPIViewMixin, generics.RetrieveDestroyAPIView):
         return self.generate_no_error_response({})
 
 
-class TeamsView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
+class TeamsView(GameShardViewMixin, ActiveUserAPIViewMixin, generics.ListCreateAPIView):
     serializer_class = TeamSerializer
 
     def get_queryset(self):
@@ -156,12 +185,17 @@ class TeamsView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
         data: dict = super().get(request, *args, **kwargs).data
         return self.generate_no_error_response(data)
 
-    @atomic
+    @shard_atomic
     def post(self, request: Request, *args, **kwargs) -> Response:
         game_id: int = self.kwargs["game_id"]
-        game: Optional[Game] = Game.objects.filter(id=game_id).first()
+        # Locked against the archiver, which deletes the rows of the game once it has written them
+        game: Optional[Game] = (
+            Game.objects.select_for_update(no_key=True).filter(id=game_id).first()
+        )
         if game is None:
             raise ErrorCodeException(ErrorCode.resource_not_found)
+        if game.archived_at is not None:
+            raise ErrorCodeException(ErrorCode.game_archived)
 
         serializer: TeamSerializer = self.get_serializer(data=request.data)
         serializer.raise_validation_error_if_any()
@@ -177,7 +211,7 @@ class TeamsView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
         return self.generate_no_error_response({})
 
 
-class TeamView(ActiveUserAPIViewMixin, generics.RetrieveUpdateDestroyAPIView):
+class TeamView(GameShardViewMixin, ActiveUserAPIViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = TeamSerializer
 
     def get_object(self) -> Team:
@@ -0,0 +1,117 @@
+"""
+Idempotency-Key support for write requests that clients retry.
+
+The first request with a key claims it by inserting its record, in the transaction of the
+request, and stores its response there before committing. A retry finds the record and gets
+the stored response back, without running the request again. A duplicate arriving while the
+first one is still running waits on the unique index of the records until it commits, then
+replays its response, or runs itself if the first one failed and rolled the claim back.
+Records are kept IDEMPOTENCY_KEY_TTL_SECONDS, on the shard of the game.
+"""
+
+import datetime
+import functools
+import hashlib
+import json
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from backend.models import IDEMPOTENCY_KEY_MAX_LENGTH, IdempotencyRecord
+from common.dbrouting import get_current_shard
+from common.rest.exceptions import ErrorCode, ErrorCodeException
+
+IDEMPOTENCY_KEY_HEADER: str = "Idempotency-Key"
+REPLAYED_HEADER: str = "Idempotent-Replayed"
+# Set again when the replayed response is rendered
+UNSTORED_HEADERS: tuple[str, ...] = ("content-type", "content-length")
+
+
+def idempotent(func: Callable) -> Callable:
+    """
+    Replays the response of the first request sent with the same Idempotency-Key. Goes under
+    `@shard_atomic`, the key being claimed in the transaction of the request.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, request: Request, *args, **kwargs) -> Response:
+        key: Optional[str] = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if key is None:
+            return func(self, request, *args, **kwargs)
+        if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise ErrorCodeException(ErrorCode.bad_request)
+
+        fingerprint: str = _get_fingerprint(request)
+        record: Optional[IdempotencyRecord] = _claim_key(request.user.id, key, fingerprint)
+        if record is not None:
+            if record.fingerprint != fingerprint:
+                raise ErrorCodeException(ErrorCode.idempotency_key_reused)
+            replayed: Response = Response(
+                record.response, status=record.status, headers=record.headers
+            )
+            replayed[REPLAYED_HEADER] = "true"
+            return replayed
+
+        response: Response = func(self, request, *args, **kwargs)
+        IdempotencyRecord.objects.filter(user_id=request.user.id, key=key).update(
+            response=response.data,
+            status=response.status_code,
+            headers={
+                name: value
+                for name, value in response.items()
+                if name.lower() not in UNSTORED_HEADERS
+            },
+        )
+        return response
+
+    return wrapper
+
+
+def purge_idempotency_records(using: str) -> int:
+    """Deletes the expired records of a shard. Returns how many were deleted."""
+    deleted, _ = (
+        IdempotencyRecord.objects.using(using).filter(created_at__lt=_get_expiry_cutoff()).delete()
+    )
+    return deleted
+
+
+def _claim_key(user_id: int, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+    """Returns the live record of an earlier request with the key, or None once claimed."""
+    table: str = IdempotencyRecord._meta.db_table
+    with connections[get_current_shard()].cursor() as cursor:
+        # Takes the key over once expired. Waits for a concurrent request holding it to finish
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (user_id, key, fingerprint, response, status, headers, created_at)
+            VALUES (%s, %s, %s, '{{}}', 200, '{{}}', %s)
+            ON CONFLICT (user_id, key) DO UPDATE SET
+                fingerprint = EXCLUDED.fingerprint,
+                response = EXCLUDED.response,
+                status = EXCLUDED.status,
+                headers = EXCLUDED.headers,
+                created_at = EXCLUDED.created_at
+            WHERE {table}.created_at < %s
+            RETURNING id
+            """,
+            [user_id, key, fingerprint, timezone.now(), _get_expiry_cutoff()],
+        )
+        if cursor.fetchone() is not None:
+            return None
+    return IdempotencyRecord.objects.get(user_id=user_id, key=key)
+
+
+def _get_fingerprint(request: Request) -> str:
+    # The parsed data rather than the body, which can't be read anymore once parsed. Keys are
+    # sorted, so that the same data sent in another order is the same request
+    data: Any = dict(request.data.lists()) if isinstance(request.data, QueryDict) else request.data
+    content: str = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(f"{request.method} {request.path}\n{content}".encode()).hexdigest()
+
+
+def _get_expiry_cutoff() -> datetime.datetime:
+    return timezone.now() - datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
@@ -0,0 +1,79 @@
+import enum
+import json
+from typing import Iterator
+
+from django.http import StreamingHttpResponse
+
+from common.dbrouting import close_connections, get_current_shard
+from common.pubsub import Subscription, event_hub
+
+KEEPALIVE_INTERVAL_SECONDS: float = 15
+CLIENT_RETRY_MILLISECONDS: int = 3000
+
+
+class RoundEventType(str, enum.Enum):
+    guess_created = "guess_created"
+    score_changed = "score_changed"
+    turn_changed = "turn_changed"
+    round_ended = "round_ended"
+
+
+def round_channel(round_id: int) -> str:
+    return f"round.{round_id}"
+
+
+def subscribe_round_events(round_id: int) -> Subscription:
+    return event_hub.subscribe(round_channel(round_id))
+
+
+def publish_round_event(round_id: int, event_type: RoundEventType, data: dict) -> None:
+    event_hub.publish_on_commit(
+        round_channel(round_id),
+        {"type": event_type.value, "data": data},
+        using=get_current_shard(),
+    )
+
+
+class RoundEventsResponse(StreamingHttpResponse):
+    """
+    Streams the events of a subscription. The server closes the response even when the client
+    leaves before the stream starts, and the subscription with it.
+    """
+
+    def __init__(self, subscription: Subscription, is_round_ended: bool) -> None:
+        super().__init__(
+            stream_round_events(subscription, is_round_ended=is_round_ended),
+            content_type="text/event-stream",
+        )
+        self.subscription: Subscription = subscription
+
+    def close(self) -> None:
+        self.subscription.close()
+        super().close()
+
+
+def stream_round_events(subscription: Subscription, is_round_ended: bool) -> Iterator[bytes]:
+    with subscription:
+        # The stream can stay open for the whole round, don't hold on to database connections
+        close_connections()
+
+        yield f"retry: {CLIENT_RETRY_MILLISECONDS}\n\n".encode()
+        if is_round_ended:
+            yield _to_server_sent_event({"type": RoundEventType.round_ended.value, "data": {}})
+            return
+
+        while True:
+            event = subscription.get(timeout=KEEPALIVE_INTERVAL_SECONDS)
+            if event is None:
+                if subscription.is_closed:
+                    return
+                yield b": keepalive\n\n"
+                continue
+
+            yield _to_server_sent_event(event)
+            if event["type"] == RoundEventType.round_ended.value:
+                return
+
+
+def _to_server_sent_event(event: dict) -> bytes:
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n".encode()
@@ -0,0 +1,73 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from backend.models import SCORE_PER_LETTERS, WRONG_PHRASE_PENALTY, GuessStatus
+
+MASK_CHARACTER: str = "_"
+
+
+@dataclass
+class GuessJudgement:
+    status: GuessStatus
+    score: int
+    should_round_ended: bool
+    # Wrong and timed out guesses hand the turn to the next team
+    should_pass_turn: bool = False
+
+
+def get_unguessed_letters(phrase_value: str, guessed_letters: Iterable[str]) -> list[str]:
+    guessed: set[str] = set(guessed_letters)
+    return [c for c in phrase_value if c not in guessed and c != " "]
+
+
+def mask_phrase(phrase_value: str, revealed_letters: Iterable[str]) -> str:
+    revealed: set[str] = set(revealed_letters)
+    return "".join(c if c == " " or c in revealed else MASK_CHARACTER for c in phrase_value)
+
+
+def judge_phrase_guess(
+    phrase_value: str, guessed_letters: Iterable[str], guess_value: str
+) -> GuessJudgement:
+    if phrase_value != guess_value:
+        return GuessJudgement(
+            status=GuessStatus.wrong,
+            score=WRONG_PHRASE_PENALTY,
+            should_round_ended=False,
+            should_pass_turn=True,
+        )
+    unguessed_letters: list[str] = get_unguessed_letters(phrase_value, guessed_letters)
+    return GuessJudgement(
+        status=GuessStatus.correct,
+        score=len(unguessed_letters) * SCORE_PER_LETTERS,
+        should_round_ended=True,
+    )
+
+
+def judge_letter_guess(
+    phrase_value: str, guessed_letters: Iterable[str], guess_value: str
+) -> GuessJudgement:
+    unguessed_letters: list[str] = get_unguessed_letters(phrase_value, guessed_letters)
+    guess_value_counts: int = unguessed_letters.count(guess_value)
+    if not guess_value_counts:
+        return GuessJudgement(
+            status=GuessStatus.wrong, score=0, should_round_ended=False, should_pass_turn=True
+        )
+
+    return GuessJudgement(
+        status=GuessStatus.correct,
+        score=guess_value_counts * SCORE_PER_LETTERS,
+        should_round_ended=guess_value_counts == len(unguessed_letters),
+    )
+
+
+def judge_timed_out_guess() -> GuessJudgement:
+    return GuessJudgement(
+        status=GuessStatus.timed_out, score=0, should_round_ended=False, should_pass_turn=True
+    )
+
+
+def rotate_team_ids(team_ids: list[int], starting_team_id: int) -> list[int]:
+    if starting_team_id not in team_ids:
+        return team_ids
+    start: int = team_ids.index(starting_team_id)
+    return team_ids[start:] + team_ids[:start]
@@ -1,8 +1,12 @@
+from typing import Optional
+
 from rest_framework import serializers
 
 from backend.models import Guess, GuessType, Round
 from common.rest.serializers import BaseSerializerMixin
 
+MAX_WAIT_SECONDS: float = 30
+
 
 class RoundCreationSerializer(serializers.Serializer, BaseSerializerMixin):
     name = serializers.CharField(max_length=200)
@@ -16,12 +20,25 @@ class RoundUpdationSerializer(serializers.Serializer, BaseSerializerMixin):
 class RoundSerializer(serializers.ModelSerializer, BaseSerializerMixin):
     team_ordering = serializers.SerializerMethodField()
 
+    current_team_id = serializers.SerializerMethodField()
+
     def get_team_ordering(self, obj: Round) -> list[int]:
         return obj.config_object.team_ids_ordering
 
+    def get_current_team_id(self, obj: Round) -> Optional[int]:
+        return None if obj.is_ended else obj.config_object.current_team_id
+
     class Meta:
         model = Round
-        fields = ["id", "name", "is_ended", "phrase_id", "team_ordering"]
+        fields = [
+            "id",
+            "name",
+            "is_ended",
+            "phrase_id",
+            "team_ordering",
+            "current_team_id",
+            "turn_deadline",
+        ]
         read_only_fields = ["__all__"]
 
 
@@ -31,13 +48,22 @@ class GuessCreationSerializer(serializers.Serializer, BaseSerializerMixin):
     value = serializers.CharField(max_length=200, default='', required=False)
 
     def validate(self, attrs: dict) -> dict:
-        if attrs["type"] == GuessType.letter and len(attrs["value"]) > 1:
-            raise serializers.ValidationError(
-                {"value": [serializers.ErrorDetail("Too long", code="max_length")]}
-            )
+        if attrs["type"] == GuessType.letter:
+            # As saved: uppercasing may lengthen it, e.g. "ß" to "SS"
+            if len(attrs["value"].upper().strip()) > 1:
+                raise serializers.ValidationError(
+                    {"value": [serializers.ErrorDetail("Too long", code="max_length")]}
+                )
         return attrs
 
 
+class GuessListingParamsSerializer(serializers.Serializer, BaseSerializerMixin):
+    after_id = serializers.IntegerField(required=False, min_value=0)
+    wait = serializers.FloatField(
+        required=False, default=0, min_value=0, max_value=MAX_WAIT_SECONDS
+    )
+
+
 class GuessSerializer(serializers.ModelSerializer, BaseSerializerMixin):
     class Meta:
         model = Guess
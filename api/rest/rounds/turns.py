@@ -0,0 +1,228 @@
+"""
+Recording guesses, and timing turns out on the server.
+
+Games with turn_seconds give every turn a deadline, stored on the round and pushed back by each
+guess. TurnTimer, run by `manage.py run_turn_timer`, keeps the upcoming deadlines of every shard
+in a heap and records a timed out guess for the rounds reaching theirs. Both it and the guesses
+API lock the round first, so whichever comes second sees the turn the other left. Once every
+team in turn lets theirs time out, the round looks abandoned and the clock stops, until a team
+guesses again.
+"""
+
+import datetime
+import heapq
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from backend.models import Game, Guess, GuessType, Round, RoundConfigs
+from common import metrics
+from common.dbrouting import close_connections, shard_atomic, shard_on_commit, use_game_shard
+from common.logger import log
+
+from .events import RoundEventType, publish_round_event
+from .judging import GuessJudgement, judge_timed_out_guess
+from .serializers import GuessSerializer
+
+DEFAULT_REFRESH_SECONDS: float = 1
+DEFAULT_HORIZON_SECONDS: float = 10
+
+
+def get_turn_deadline(game: Game) -> Optional[datetime.datetime]:
+    turn_seconds: Optional[int] = game.config_object.turn_seconds
+    if turn_seconds is None:
+        return None
+    return timezone.now() + datetime.timedelta(seconds=turn_seconds)
+
+
+def record_guess(
+    game_round: Round,
+    team_id: int,
+    guess_type: GuessType,
+    guess_value: str,
+    judgement: GuessJudgement,
+    created_by_id: int,
+) -> Guess:
+    """
+    Saves a judged guess and moves the round along. The round has to be locked, with its game
+    fetched along.
+    """
+    guess: Guess = Guess.objects.create(
+        round=game_round,
+        team_id=team_id,
+        type=guess_type,
+        status=judgement.status,
+        value=guess_value,
+        score=judgement.score,
+        created_by_id=created_by_id,
+    )
+
+    round_configs: RoundConfigs = game_round.config_object
+    previous_configs: dict = game_round.configs
+    if judgement.should_pass_turn:
+        round_configs.pass_turn()
+    if guess_type == GuessType.timed_out:
+        round_configs.timed_out_turns += 1
+    else:
+        round_configs.timed_out_turns = 0
+    game_round.config_object = round_configs
+    if judgement.should_round_ended:
+        game_round.is_ended = True
+    # Any guess restarts the clock, the team having played, but a whole rotation of time outs
+    is_abandoned: bool = round_configs.timed_out_turns >= len(round_configs.team_ids_ordering)
+    turn_deadline: Optional[datetime.datetime] = (
+        None if game_round.is_ended or is_abandoned else get_turn_deadline(game_round.game)
+    )
+    if (
+        game_round.configs != previous_configs
+        or judgement.should_round_ended
+        or turn_deadline != game_round.turn_deadline
+    ):
+        game_round.turn_deadline = turn_deadline
+        game_round.save()
+
+    _publish_guess_events(game_round, guess, judgement)
+    shard_on_commit(lambda: metrics.record_guess(guess_type.name, judgement.status.name))
+    if judgement.should_round_ended:
+        shard_on_commit(metrics.record_round_ended)
+    return guess
+
+
+@shard_atomic
+def expire_turn(round_id: int) -> Optional[datetime.datetime]:
+    """
+    Records a timed out guess for the current team if the turn of the round, on the current
+    shard, is past its deadline. Returns the deadline of the turn then current, if any.
+    """
+    game_round: Optional[Round] = (
+        Round.objects.select_related("game")
+        .select_for_update(of=("self",))
+        .filter(id=round_id)
+        .first()
+    )
+    if game_round is None or game_round.is_ended or game_round.turn_deadline is None:
+        return None
+    # Guessed in the meantime
+    if game_round.turn_deadline > timezone.now():
+        return game_round.turn_deadline
+
+    team_id: Optional[int] = game_round.config_object.current_team_id
+    if team_id is None:
+        return None
+    record_guess(
+        game_round=game_round,
+        team_id=team_id,
+        guess_type=GuessType.timed_out,
+        guess_value="",
+        judgement=judge_timed_out_guess(),
+        created_by_id=game_round.game.created_by_id,
+    )
+    return game_round.turn_deadline
+
+
+class TurnTimer:
+    """
+    Times out the turns of every shard from a single thread. Deadlines up to `horizon_seconds`
+    ahead are loaded every `refresh_seconds` into a heap, and each is checked again against the
+    round, locked, once reached. Neither can be shorter than the turns.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+        horizon_seconds: float = DEFAULT_HORIZON_SECONDS,
+    ) -> None:
+        self.refresh_seconds: float = refresh_seconds
+        self.horizon_seconds: float = horizon_seconds
+        # (deadline timestamp, shard, round id)
+        self._heap: list[tuple[float, str, int]] = []
+        # Deadline in the heap per shard and round, to not push it again on every refresh
+        self._scheduled: dict[tuple[str, int], float] = {}
+        self._next_refresh_at: float = 0
+
+    def run(self) -> None:
+        while True:
+            self.run_once()
+            next_at: float = self._next_refresh_at
+            if self._heap:
+                next_at = min(next_at, self._heap[0][0])
+            time.sleep(max(0.0, next_at - time.time()))
+
+    def run_once(self) -> int:
+        """Expires the turns due. Returns how many were due."""
+        now: float = time.time()
+        if now >= self._next_refresh_at:
+            self._refresh()
+            self._next_refresh_at = now + self.refresh_seconds
+
+        due: int = 0
+        while self._heap and self._heap[0][0] <= now:
+            deadline, shard, round_id = heapq.heappop(self._heap)
+            if self._scheduled.get((shard, round_id)) != deadline:
+                # Rescheduled since
+                continue
+            del self._scheduled[(shard, round_id)]
+            due += 1
+            self._expire(shard, round_id)
+        return due
+
+    def _refresh(self) -> None:
+        until: datetime.datetime = timezone.now() + datetime.timedelta(seconds=self.horizon_seconds)
+        for shard in settings.GAME_SHARDS:
+            try:
+                with use_game_shard(shard):
+                    deadlines: list[tuple[int, datetime.datetime]] = list(
+                        Round.objects.filter(is_ended=False, turn_deadline__lte=until)
+                        .order_by("turn_deadline")
+                        .values_list("id", "turn_deadline")
+                    )
+            except DatabaseError as e:
+                log.warning("turn_timer|shard=%s|refresh failed|error=%s", shard, e)
+                close_connections()
+                continue
+            for round_id, turn_deadline in deadlines:
+                self._schedule(shard, round_id, turn_deadline)
+
+    def _expire(self, shard: str, round_id: int) -> None:
+        try:
+            with use_game_shard(shard):
+                turn_deadline: Optional[datetime.datetime] = expire_turn(round_id)
+        except DatabaseError as e:
+            log.warning("turn_timer|shard=%s|round=%s|expire failed|error=%s", shard, round_id, e)
+            close_connections()
+            return
+        if turn_deadline is not None:
+            self._schedule(shard, round_id, turn_deadline)
+
+    def _schedule(self, shard: str, round_id: int, turn_deadline: datetime.datetime) -> None:
+        deadline: float = turn_deadline.timestamp()
+        if self._scheduled.get((shard, round_id)) == deadline:
+            return
+        self._scheduled[(shard, round_id)] = deadline
+        heapq.heappush(self._heap, (deadline, shard, round_id))
+
+
+def _publish_guess_events(game_round: Round, guess: Guess, judgement: GuessJudgement) -> None:
+    publish_round_event(game_round.id, RoundEventType.guess_created, GuessSerializer(guess).data)
+    if judgement.score:
+        publish_round_event(
+            game_round.id,
+            RoundEventType.score_changed,
+            {"team_id": guess.team_id, "score": judgement.score},
+        )
+    if judgement.should_pass_turn:
+        publish_round_event(
+            game_round.id,
+            RoundEventType.turn_changed,
+            {
+                "team_id": game_round.config_object.current_team_id,
+                "turn_deadline": (
+                    game_round.turn_deadline.isoformat() if game_round.turn_deadline else None
+                ),
+            },
+        )
+    if judgement.should_round_ended:
+        publish_round_event(game_round.id, RoundEventType.round_ended, {})
@@ -1,17 +1,23 @@
+import hashlib
+import json
 import random
-from dataclasses import dataclass
-from typing import Optional
+import time
+from typing import Any, Optional
 
 from django.contrib.auth.models import User
-from django.db.transaction import atomic
-from more_itertools import circular_shifts, first_true
-from rest_framework import generics
+from django.db import IntegrityError
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.utils.http import parse_etags
+from psycopg2 import errorcodes
+from rest_framework import generics, status
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from api.rest.games.serializers import TeamSerializer, get_leaderboard
+from api.rest.idempotency import idempotent
+from backend.archives import ArchivedGame, ArchiveUnavailableError, archive_cache
 from backend.models import (
-    SCORE_PER_LETTERS,
-    WRONG_PHRASE_PENALTY,
     Game,
     Guess,
     GuessStatus,
@@ -21,20 +27,43 @@ from backend.models import (
     Round,
     RoundConfigs,
     Team,
+    normalize_phrase,
 )
+from common import metrics
+from common.dbrouting import (
+    close_connections,
+    read_snapshot,
+    shard_atomic,
+    shard_on_commit,
+    use_primary,
+)
+from common.pubsub import Subscription
 from common.rest.exceptions import ErrorCode, ErrorCodeException
-from common.rest.views import ActiveUserAPIViewMixin
-
+from common.rest.views import ActiveUserAPIViewMixin, GameShardViewMixin
+
+from .events import RoundEventsResponse, RoundEventType, subscribe_round_events
+from .judging import (
+    GuessJudgement,
+    judge_letter_guess,
+    judge_phrase_guess,
+    judge_timed_out_guess,
+    mask_phrase,
+    rotate_team_ids,
+)
 from .serializers import (
     GuessCreationSerializer,
+    GuessListingParamsSerializer,
     GuessSerializer,
     RoundCreationSerializer,
     RoundSerializer,
     RoundUpdationSerializer,
 )
+from .turns import get_turn_deadline, record_guess
+
+MAX_INCREMENTAL_GUESSES: int = 1000
 
 
-class RoundsView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
+class RoundsView(GameShardViewMixin, ActiveUserAPIViewMixin, generics.ListCreateAPIView):
     serializer_class = RoundSerializer
 
     def get_queryset(self):
@@ -48,35 +77,53 @@ class RoundsView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
         data: dict = super().get(request, *args, **kwargs).data
         return self.generate_no_error_response(data)
 
-    @atomic
+    @shard_atomic
+    @idempotent
     def post(self, request, *args, **kwargs) -> Response:
         game_id: int = self.kwargs["game_id"]
-        game: Optional[Game] = Game.objects.filter(id=game_id).first()
+        # Locked against the archiver, which deletes the rows of the game once it has written them
+        game: Optional[Game] = (
+            Game.objects.select_for_update(no_key=True).filter(id=game_id).first()
+        )
         if game is None:
             raise ErrorCodeException(ErrorCode.resource_not_found)
-
-        if Round.objects.filter(game=game, is_ended=False).exists():
-            raise ErrorCodeException(ErrorCode.any_round_still_ongoing)
+        if game.archived_at is not None:
+            raise ErrorCodeException(ErrorCode.game_archived)
 
         serializer: RoundCreationSerializer = RoundCreationSerializer(data=request.data)
         serializer.raise_validation_error_if_any()
         validated_data: dict = serializer.validated_data
 
-        team_ids_order: list[int] = self._compute_team_ids_order(
-            game=game, starting_team_id=validated_data["starting_team_id"]
-        )
+        try:
+            team_ids_order: list[int] = self._compute_team_ids_order(
+                game=game, starting_team_id=validated_data["starting_team_id"]
+            )
+            phrase: Phrase = self._compute_phrase(game)
+        except ErrorCodeException as e:
+            # An ongoing round is reported first. Only looked for on failure, the constraint
+            # catching it otherwise
+            if Round.objects.filter(game=game, is_ended=False).exists():
+                raise ErrorCodeException(ErrorCode.any_round_still_ongoing) from e
+            raise
         configs: RoundConfigs = RoundConfigs(team_ids_ordering=team_ids_order)
 
-        phrase: Phrase = self._compute_phrase(game)
         requester: User = request.user
-        new_round: Round = Round.objects.create(
-            game=game,
-            phrase=phrase,
-            name=validated_data["name"],
-            configs=configs.to_dict(),
-            created_by_id=requester.id,
-            updated_by_id=requester.id,
-        )
+        try:
+            new_round: Round = Round.objects.create(
+                game=game,
+                phrase=phrase,
+                name=validated_data["name"],
+                configs=configs.to_dict(),
+                turn_deadline=get_turn_deadline(game),
+                created_by_id=requester.id,
+                updated_by_id=requester.id,
+            )
+        except IntegrityError as e:
+            # Enforced by the database, so that concurrent creations can't both get through
+            if _is_round_uniqueness_violated(e):
+                raise ErrorCodeException(ErrorCode.any_round_still_ongoing) from e
+            raise
+        shard_on_commit(metrics.record_round_created)
         return self.generate_no_error_response({"id": new_round.id})
 
     def _compute_team_ids_order(self, game: Game, starting_team_id: int) -> list[int]:
@@ -87,19 +134,13 @@ class RoundsView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
         if game.config_object.team_order == Ordering.random:
             random.shuffle(team_ids)
 
-        if starting_team_id not in team_ids:
-            return team_ids
-
-        return list(
-            first_true(circular_shifts(team_ids), pred=lambda ids: ids[0] == starting_team_id)
-        )
+        return rotate_team_ids(team_ids, starting_team_id)
 
     def _compute_phrase(self, game: Game) -> Phrase:
-        used_phrase_ids: list[int] = list(
-            Round.objects.filter(game=game).values_list("phrase_id", flat=True)
-        )
         available_phrases: list[Phrase] = list(
-            Phrase.objects.exclude(id__in=used_phrase_ids).filter(game=game).order_by("id")
+            Phrase.objects.filter(game=game)
+            .exclude(id__in=Round.objects.filter(game=game).values("phrase_id"))
+            .order_by("id")
         )
         if not available_phrases:
             raise ErrorCodeException(ErrorCode.phrases_all_used)
@@ -109,7 +150,7 @@ class RoundsView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
         return available_phrases[0]
 
 
-class RoundView(ActiveUserAPIViewMixin, generics.RetrieveUpdateDestroyAPIView):
+class RoundView(GameShardViewMixin, ActiveUserAPIViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = RoundSerializer
 
     def get_object(self) -> Round:
@@ -133,7 +174,8 @@ class RoundView(ActiveUserAPIViewMixin, generics.RetrieveUpdateDestroyAPIView):
         validated_data: dict = serializer.validated_data
         game_round.name = validated_data["name"]
         game_round.updated_by_id = requester.id
-        game_round.save()
+        # Not the turn or the deadline, which guesses and the turn timer may have moved since
+        game_round.save(update_fields=["name", "updated_by_id", "updated_at"])
         return self.generate_no_error_response({})
 
     def delete(self, request, *args, **kwargs) -> Response:
@@ -142,36 +184,121 @@ class RoundView(ActiveUserAPIViewMixin, generics.RetrieveUpdateDestroyAPIView):
         return self.generate_no_error_response({})
 
 
-@dataclass
-class GuessJudgement:
-    status: GuessStatus
-    score: int
-    should_round_ended: bool
-
-
-class GuessesView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
+class GuessesView(GameShardViewMixin, ActiveUserAPIViewMixin, generics.ListCreateAPIView):
     serializer_class = GuessSerializer
 
     def get_queryset(self):
+        return Guess.objects.filter(round=self._get_round()).order_by("id")
+
+    def get(self, request, *args, **kwargs) -> Response:
+        params_serializer: GuessListingParamsSerializer = GuessListingParamsSerializer(
+            data=request.query_params
+        )
+        params_serializer.raise_validation_error_if_any()
+        params: dict = params_serializer.validated_data
+        try:
+            if params.get("after_id") is None:
+                data: dict = super().get(request, *args, **kwargs).data
+                return self.generate_no_error_response(data)
+
+            return self.generate_no_error_response(
+                self._list_guesses_after(after_id=params["after_id"], wait=params["wait"])
+            )
+        except ErrorCodeException as e:
+            # The rounds of an archived game are gone, only look for an archive then
+            if e.error_code != ErrorCode.resource_not_found:
+                raise
+            archive: Optional[ArchivedGame] = self._get_archive()
+            if archive is None:
+                raise
+            return self.generate_no_error_response(
+                self._list_archived_guesses(archive, after_id=params.get("after_id"))
+            )
+
+    def _get_archive(self) -> Optional[ArchivedGame]:
+        game_id: int = self.kwargs["game_id"]
+        if not Game.objects.filter(id=game_id, archived_at__isnull=False).exists():
+            return None
+        try:
+            archive: ArchivedGame = archive_cache.get(game_id)
+        except ArchiveUnavailableError as e:
+            raise ErrorCodeException(ErrorCode.game_archive_unavailable) from e
+        if archive.get_round(self.kwargs["round_id"]) is None:
+            return None
+        return archive
+
+    def _list_archived_guesses(self, archive: ArchivedGame, after_id: Optional[int]) -> dict:
+        guesses: list[dict] = archive.get_round_guesses(
+            self.kwargs["round_id"], after_id=after_id or 0
+        )
+        if after_id is None:
+            page: list[dict] = self.paginate_queryset(guesses)
+            return self.get_paginated_response(self.get_serializer(page, many=True).data).data
+
+        guesses = guesses[:MAX_INCREMENTAL_GUESSES]
+        return {
+            "items": GuessSerializer(guesses, many=True).data,
+            "last_id": guesses[-1]["id"] if guesses else after_id,
+        }
+
+    def _get_round(self) -> Round:
         round_id: int = self.kwargs["round_id"]
         game_round: Optional[Round] = Round.objects.filter(id=round_id).first()
         if game_round is None:
             raise ErrorCodeException(ErrorCode.resource_not_found)
-        return Guess.objects.filter(round=game_round).order_by("id")
+        return game_round
 
-    def get(self, request, *args, **kwargs) -> Response:
-        data: dict = super().get(request, *args, **kwargs).data
-        return self.generate_no_error_response(data)
+    def _list_guesses_after(self, after_id: int, wait: float) -> dict:
+        game_round: Round = self._get_round()
+        if not wait or game_round.is_ended:
+            return self._serialize_guesses_after(game_round, after_id)
+
+        # Subscribe before querying, so that a guess committed in between still wakes us up
+        with subscribe_round_events(game_round.id) as subscription:
+            data: dict = self._serialize_guesses_after(game_round, after_id)
+            if data["items"]:
+                return data
+
+            # Waiting is cooperative under the gevent worker, release the connections meanwhile
+            close_connections()
+            deadline: float = time.monotonic() + wait
+            while (remaining := deadline - time.monotonic()) > 0:
+                event: Optional[dict] = subscription.get(timeout=remaining)
+                if event is None:
+                    break
+                if event["type"] in (
+                    RoundEventType.guess_created.value,
+                    RoundEventType.round_ended.value,
+                ):
+                    # A replica may not have the guess of the event yet
+                    with use_primary():
+                        return self._serialize_guesses_after(game_round, after_id)
+            return data
+
+    def _serialize_guesses_after(self, game_round: Round, after_id: int) -> dict:
+        guesses: list[Guess] = list(
+            Guess.objects.filter(round_id=game_round.id, id__gt=after_id).order_by("id")[
+                :MAX_INCREMENTAL_GUESSES
+            ]
+        )
+        return {
+            "items": GuessSerializer(guesses, many=True).data,
+            "last_id": guesses[-1].id if guesses else after_id,
+        }
 
-    @atomic
+    @shard_atomic
+    @idempotent
     def post(self, request, *args, **kwargs) -> Response:
         game_id: int = self.kwargs["game_id"]
-        game: Optional[Game] = Game.objects.filter(id=game_id).first()
-        if game is None:
-            raise ErrorCodeException(ErrorCode.resource_not_found)
-
         round_id: int = self.kwargs["round_id"]
-        game_round: Optional[Round] = Round.objects.filter(id=round_id).first()
+        # The phrase is needed to judge any guess, and the game for its configs. The round is
+        # locked so that concurrent guesses pass the turn one after the other
+        game_round: Optional[Round] = (
+            Round.objects.select_related("phrase", "game")
+            .select_for_update(of=("self",))
+            .filter(id=round_id, game_id=game_id)
+            .first()
+        )
         if game_round is None:
             raise ErrorCodeException(ErrorCode.resource_not_found)
 
@@ -182,10 +309,20 @@ class GuessesView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
         serializer.raise_validation_error_if_any()
         validated_data: dict = serializer.validated_data
 
-        team: Optional[Team] = Team.objects.filter(id=validated_data["team_id"], game=game).first()
+        team: Optional[Team] = Team.objects.filter(
+            id=validated_data["team_id"], game_id=game_id
+        ).first()
         if team is None:
             raise ErrorCodeException(ErrorCode.bad_request)
 
+        round_configs: RoundConfigs = game_round.config_object
+        if (
+            game_round.game.config_object.enforce_turns
+            and round_configs.current_team_id is not None
+            and team.id != round_configs.current_team_id
+        ):
+            raise ErrorCodeException(ErrorCode.not_team_turn)
+
         guess_type: GuessType = GuessType(validated_data["type"])
         guess_value: str = validated_data["value"].upper().strip()
         judgement: GuessJudgement = self._judge_guess(
@@ -195,24 +332,21 @@ class GuessesView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
         )
 
         requester: User = request.user
-        Guess.objects.create(
-            round=game_round,
-            team=team,
-            type=guess_type,
-            status=judgement.status,
-            value=guess_value,
-            score=judgement.score,
+        record_guess(
+            game_round=game_round,
+            team_id=team.id,
+            guess_type=guess_type,
+            guess_value=guess_value,
+            judgement=judgement,
             created_by_id=requester.id,
         )
-        if judgement.should_round_ended:
-            game_round.is_ended = True
-            game_round.save()
         return self.generate_no_error_response(
             {
                 "status": judgement.status,
                 "score": judgement.score,
                 "team_id": team.id,
                 "should_end": judgement.should_round_ended,
+                "current_team_id": game_round.config_object.current_team_id,
             }
         )
 
@@ -227,42 +361,113 @@ class GuessesView(ActiveUserAPIViewMixin, generics.ListCreateAPIView):
             return self._judge_timed_out_guess()
 
     def _judge_phrase_guess(self, game_round: Round, guess_value: str) -> GuessJudgement:
-        phrase_value: str = game_round.phrase.value
-        if phrase_value != guess_value:
-            return GuessJudgement(
-                status=GuessStatus.wrong, score=WRONG_PHRASE_PENALTY, should_round_ended=False
-            )
-        unguessed_letters: list[str] = _get_unguessed_letters(game_round)
-        return GuessJudgement(
-            status=GuessStatus.correct,
-            score=len(unguessed_letters) * SCORE_PER_LETTERS,
-            should_round_ended=True,
+        return judge_phrase_guess(
+            game_round.phrase.key, _get_guessed_letters(game_round), normalize_phrase(guess_value)
         )
 
     def _judge_letter_guess(self, game_round: Round, guess_value: str) -> GuessJudgement:
-        unguessed_letters: list[str] = _get_unguessed_letters(game_round)
-        if guess_value not in unguessed_letters:
-            return GuessJudgement(status=GuessStatus.wrong, score=0, should_round_ended=False)
-
-        guess_value_counts: int = len(
-            [letter for letter in unguessed_letters if letter == guess_value]
-        )
-        return GuessJudgement(
-            status=GuessStatus.correct,
-            score=guess_value_counts * SCORE_PER_LETTERS,
-            should_round_ended=guess_value_counts == len(unguessed_letters),
+        return judge_letter_guess(
+            game_round.phrase.value, _get_guessed_letters(game_round), guess_value
         )
 
     def _judge_timed_out_guess(self) -> GuessJudgement:
-        return GuessJudgement(status=GuessStatus.timed_out, score=0, should_round_ended=False)
+        return judge_timed_out_guess()
 
 
-def _get_unguessed_letters(game_round: Round) -> list[str]:
-    phrase_value: str = game_round.phrase.value
-    guessed_letters: set[str] = {
-        g.value
-        for g in Guess.objects.filter(
-            round=game_round, status=GuessStatus.correct, type=GuessType.letter
+class RoundEventsView(GameShardViewMixin, ActiveUserAPIViewMixin, generics.GenericAPIView):
+    def get(self, request: Request, *args, **kwargs) -> StreamingHttpResponse:
+        game_id: int = self.kwargs["game_id"]
+        round_id: int = self.kwargs["round_id"]
+        game_round: Optional[Round] = Round.objects.filter(id=round_id, game_id=game_id).first()
+        if game_round is None:
+            raise ErrorCodeException(ErrorCode.resource_not_found)
+
+        # Subscribe before reporting the round state, so that a round ending in between isn't missed
+        subscription: Subscription = subscribe_round_events(round_id)
+        response: RoundEventsResponse = RoundEventsResponse(
+            subscription, is_round_ended=game_round.is_ended
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class RoundDashboardView(GameShardViewMixin, ActiveUserAPIViewMixin, generics.GenericAPIView):
+    """
+    Everything a host screen renders for a round, in a fixed number of queries that all see the
+    same snapshot. Polled with If-None-Match, an unchanged dashboard is answered with a 304.
+    """
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        game_id: int = self.kwargs["game_id"]
+        round_id: int = self.kwargs["round_id"]
+        with read_snapshot(Round):
+            game_round: Optional[Round] = (
+                Round.objects.select_related("phrase", "game")
+                .filter(id=round_id, game_id=game_id)
+                .first()
+            )
+            if game_round is None:
+                raise ErrorCodeException(ErrorCode.resource_not_found)
+            guesses: list[Guess] = list(Guess.objects.filter(round=game_round).order_by("id"))
+            teams: list[Team] = list(Team.objects.filter(game_id=game_id).order_by("id"))
+            leaderboard: list[dict[str, int]] = get_leaderboard(game_round.game)
+
+        revealed_letters: list[str] = sorted(
+            {
+                g.value
+                for g in guesses
+                if g.type == GuessType.letter and g.status == GuessStatus.correct
+            }
         )
-    }
-    return [c for c in phrase_value if c not in guessed_letters and c != " "]
+        data: dict = {
+            "round": RoundSerializer(game_round).data,
+            # Revealed whole once the round is over
+            "masked_phrase": (
+                game_round.phrase.value
+                if game_round.is_ended
+                else mask_phrase(game_round.phrase.value, revealed_letters)
+            ),
+            "revealed_letters": revealed_letters,
+            "guesses": GuessSerializer(guesses, many=True).data,
+            "teams": TeamSerializer(teams, many=True).data,
+            "current_team_id": (
+                None if game_round.is_ended else game_round.config_object.current_team_id
+            ),
+            "leaderboard": leaderboard,
+        }
+
+        etag: str = _compute_etag(data)
+        if _is_etag_matched(etag, request.META.get("HTTP_IF_NONE_MATCH", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response: Response = self.generate_no_error_response(data)
+        response["ETag"] = etag
+        return response
+
+
+def _compute_etag(data: dict) -> str:
+    content: bytes = json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+    return f'"{hashlib.sha1(content).hexdigest()}"'
+
+
+def _is_etag_matched(etag: str, if_none_match: str) -> bool:
+    # Weak comparison, as for If-None-Match. "*" matches any current representation
+    etags: list[str] = parse_etags(if_none_match)
+    return "*" in etags or etag in (e.removeprefix("W/") for e in etags)
+
+
+def _get_guessed_letters(game_round: Round) -> QuerySet:
+    # Lazy, a wrong phrase guess is judged without querying them
+    return Guess.objects.filter(
+        round=game_round, status=GuessStatus.correct, type=GuessType.letter
+    ).values_list("value", flat=True)
+
+
+def _is_round_uniqueness_violated(e: IntegrityError) -> bool:
+    # Either ONGOING_ROUND_CONSTRAINT, or the phrase being used twice in the game, which can only
+    # happen when racing another round creation, that is still ongoing
+    cause: Any = e.__cause__
+    return (
+        getattr(cause, "pgcode", None) == errorcodes.UNIQUE_VIOLATION
+        and cause.diag.table_name == Round._meta.db_table
+    )
@@ -14,6 +14,13 @@ urlpatterns = [
     path("games/<int:game_id>/rounds/<int:round_id>/", rounds_views.RoundView.as_view()),
     path("games/<int:game_id>/rounds/", rounds_views.RoundsView.as_view()),
     path("games/<int:game_id>/rounds/<int:round_id>/guesses/", rounds_views.GuessesView.as_view()),
+    path(
+        "games/<int:game_id>/rounds/<int:round_id>/events/", rounds_views.RoundEventsView.as_view()
+    ),
+    path(
+        "games/<int:game_id>/rounds/<int:round_id>/dashboard/",
+        rounds_views.RoundDashboardView.as_view(),
+    ),
     path("games/<int:game_id>/", games_views.GameView.as_view()),
     path("games/", games_views.GamesView.as_view()),
 ]
@@ -0,0 +1,223 @@
+"""
+Cold archives of finished games.
+
+A game is archived into a gzipped JSON lines file in ARCHIVE_STORAGE, one line per row of its
+phrases, teams, rounds and guesses, and those rows are deleted once the file reads back whole.
+The storage has to be shared by every process, the archiver writing what the web workers read:
+a volume mounted by all of them, or object storage. The Game row itself stays, marked with
+archived_at, so that listings, ids and permissions keep working. Reads go through an
+in-process LRU cache of the parsed files.
+"""
+
+import datetime
+import gzip
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import IO, Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, Storage, get_storage_class
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, QuerySet
+from django.utils import timezone
+
+from backend.models import Game, Guess, Phrase, Round, Team
+from common import metrics
+from common.dbrouting import get_game_shard, shard_atomic, use_game_shard
+
+ARCHIVE_CACHE_NAME: str = "archived_games"
+PHRASE_FIELDS: list[str] = ["id", "value", "created_at", "created_by_id"]
+TEAM_FIELDS: list[str] = ["id", "name", "created_at", "created_by_id"]
+ROUND_FIELDS: list[str] = ["id", "name", "is_ended", "phrase_id", "configs", "created_at"]
+GUESS_FIELDS: list[str] = [
+    "id",
+    "round_id",
+    "team_id",
+    "type",
+    "status",
+    "value",
+    "score",
+    "created_at",
+    "created_by_id",
+]
+
+
+@dataclass
+class ArchivedGame:
+    game_id: int
+    phrases: list[dict] = field(default_factory=list)
+    teams: list[dict] = field(default_factory=list)
+    rounds: list[dict] = field(default_factory=list)
+    # Ordered by id
+    guesses: list[dict] = field(default_factory=list)
+
+    def get_round(self, round_id: int) -> Optional[dict]:
+        return next((r for r in self.rounds if r["id"] == round_id), None)
+
+    def get_round_guesses(self, round_id: int, after_id: int = 0) -> list[dict]:
+        return [g for g in self.guesses if g["round_id"] == round_id and g["id"] > after_id]
+
+    def get_leaderboard(self) -> list[dict[str, int]]:
+        scores: dict[int, int] = {}
+        for guess in self.guesses:
+            scores[guess["team_id"]] = scores.get(guess["team_id"], 0) + guess["score"]
+        return [{"team_id": t, "total_score": s} for t, s in sorted(scores.items())]
+
+
+class ArchiveUnavailableError(Exception):
+    """The archive of a game is missing from the storage, or can't be read."""
+
+
+class ArchiveCache:
+    """Least recently used archives, parsed. Archives never change once written."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size: int = max_size
+        self._lock: threading.Lock = threading.Lock()
+        self._archives: OrderedDict[int, ArchivedGame] = OrderedDict()
+
+    def get(self, game_id: int) -> ArchivedGame:
+        with self._lock:
+            archive: Optional[ArchivedGame] = self._archives.get(game_id)
+            if archive is not None:
+                self._archives.move_to_end(game_id)
+        metrics.record_cache_lookup(ARCHIVE_CACHE_NAME, is_hit=archive is not None)
+        if archive is not None:
+            return archive
+
+        archive = read_archive(game_id)
+        with self._lock:
+            self._archives[game_id] = archive
+            while len(self._archives) > self.max_size:
+                self._archives.popitem(last=False)
+        return archive
+
+    def discard(self, game_id: int) -> None:
+        with self._lock:
+            self._archives.pop(game_id, None)
+
+
+def get_archive_storage() -> Storage:
+    storage_class = get_storage_class(settings.ARCHIVE_STORAGE)
+    if issubclass(storage_class, FileSystemStorage):
+        return storage_class(location=settings.ARCHIVE_DIR)
+    return storage_class()
+
+
+def get_archive_name(game_id: int) -> str:
+    return f"game-{game_id}.jsonl.gz"
+
+
+def get_finished_games(idle_for: datetime.timedelta) -> QuerySet:
+    """
+    Games not archived yet, whose rounds all ended before `idle_for` ago. A round ends with
+    its last guess, and no guess is accepted on an ended round. Queries the current shard.
+    """
+    cutoff: datetime.datetime = timezone.now() - idle_for
+    return (
+        Game.objects.filter(archived_at__isnull=True, round__isnull=False)
+        .exclude(round__is_ended=False)
+        .annotate(last_round_update=Max("round__updated_at"))
+        .filter(last_round_update__lt=cutoff)
+        .order_by("id")
+    )
+
+
+def archive_game(game: Game) -> str:
+    """
+    Writes the archive of the game, then deletes its rows once the archive reads back from the
+    storage. Returns the name of the archive.
+    """
+    name: str = get_archive_name(game.id)
+    with use_game_shard(get_game_shard(game.id)), shard_atomic():
+        locked_game: Game = Game.objects.select_for_update().get(id=game.id)
+        if locked_game.archived_at is not None:
+            raise ValueError(f"Game {game.id} is already archived")
+        if Round.objects.filter(game=game, is_ended=False).exists():
+            raise ValueError(f"Game {game.id} has a round ongoing")
+
+        with tempfile.TemporaryFile() as tmp:
+            row_counts: dict[str, int] = _write_archive(tmp, game)
+            tmp.seek(0)
+            # Storages save under another name rather than overwrite, e.g. after a failed run
+            archive_storage.delete(name)
+            archive_storage.save(name, File(tmp))
+        _check_archive(game.id, row_counts)
+
+        Guess.objects.filter(round__game=game).delete()
+        Round.objects.filter(game=game).delete()
+        Team.objects.filter(game=game).delete()
+        Phrase.objects.filter(game=game).delete()
+        locked_game.archived_at = timezone.now()
+        locked_game.save(update_fields=["archived_at"])
+    return name
+
+
+def read_archive(game_id: int) -> ArchivedGame:
+    archive: ArchivedGame = ArchivedGame(game_id=game_id)
+    rows_by_kind: dict[str, list[dict]] = {
+        "phrase": archive.phrases,
+        "team": archive.teams,
+        "round": archive.rounds,
+        "guess": archive.guesses,
+    }
+    try:
+        with archive_storage.open(get_archive_name(game_id), "rb") as f:
+            with gzip.open(f, "rt", encoding="utf-8") as lines:
+                for line in lines:
+                    row: dict = json.loads(line)
+                    rows_by_kind[row.pop("kind")].append(row)
+    except (OSError, EOFError, ValueError, KeyError) as e:
+        raise ArchiveUnavailableError(f"Archive of game {game_id}: {e}") from e
+    return archive
+
+
+def delete_archive(game_id: int) -> None:
+    archive_cache.discard(game_id)
+    archive_storage.delete(get_archive_name(game_id))
+
+
+def _write_archive(f: IO[bytes], game: Game) -> dict[str, int]:
+    with gzip.open(f, "wt", encoding="utf-8") as lines:
+        return {
+            "phrase": _write_rows(lines, "phrase", Phrase.objects.filter(game=game), PHRASE_FIELDS),
+            "team": _write_rows(lines, "team", Team.objects.filter(game=game), TEAM_FIELDS),
+            "round": _write_rows(lines, "round", Round.objects.filter(game=game), ROUND_FIELDS),
+            "guess": _write_rows(
+                lines, "guess", Guess.objects.filter(round__game=game), GUESS_FIELDS
+            ),
+        }
+
+
+def _check_archive(game_id: int, row_counts: dict[str, int]) -> None:
+    try:
+        archive: ArchivedGame = read_archive(game_id)
+    except ArchiveUnavailableError as e:
+        raise ValueError(f"Game {game_id} wasn't archived, it doesn't read back: {e}") from e
+    read_counts: dict[str, int] = {
+        "phrase": len(archive.phrases),
+        "team": len(archive.teams),
+        "round": len(archive.rounds),
+        "guess": len(archive.guesses),
+    }
+    if read_counts != row_counts:
+        raise ValueError(
+            f"Game {game_id} wasn't archived, {read_counts} rows read back of {row_counts}"
+        )
+
+
+def _write_rows(f, kind: str, queryset, fields: list[str]) -> int:
+    count: int = 0
+    for row in queryset.order_by("id").values(*fields).iterator():
+        f.write(json.dumps({"kind": kind, **row}, cls=DjangoJSONEncoder, separators=(",", ":")))
+        f.write("\n")
+        count += 1
+    return count
+
+
+archive_storage: Storage = get_archive_storage()
+archive_cache: ArchiveCache = ArchiveCache(max_size=settings.ARCHIVE_CACHE_SIZE)
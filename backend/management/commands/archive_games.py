@@ -0,0 +1,75 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+
+from backend.archives import archive_game, get_finished_games
+from backend.models import Game
+from backend.partitions import ensure_guess_partitions
+from common.dbrouting import use_game_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the games whose rounds all ended a while ago out of the database, into "
+        "compressed archives that the API keeps serving them from. Also creates the guess "
+        "partitions needed ahead of new rounds."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--idle-days", type=float, default=30, help="Days since the last round ended"
+        )
+        parser.add_argument("--limit", type=int, help="Games to archive at most per run")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="List the games without archiving them"
+        )
+        parser.add_argument("--loop", action="store_true", help="Keep running every --interval")
+        parser.add_argument(
+            "--interval", type=float, default=3600, help="Seconds between runs, with --loop"
+        )
+
+    def handle(self, *args, **options) -> None:
+        while True:
+            if not options["dry_run"]:
+                self._ensure_guess_partitions()
+            self._archive_games(
+                idle_for=datetime.timedelta(days=options["idle_days"]),
+                limit=options["limit"],
+                dry_run=options["dry_run"],
+            )
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
+
+    def _ensure_guess_partitions(self) -> None:
+        for shard in settings.GAME_SHARDS:
+            try:
+                created: list[str] = ensure_guess_partitions(using=shard)
+            except DatabaseError as e:
+                # e.g. timed out waiting for the guess table, tried again on the next pass
+                self.stderr.write(f"Guess partitions of {shard} not created: {e}")
+                continue
+            for name in created:
+                self.stdout.write(f"Created guess partition {name} on {shard}")
+
+    def _archive_games(self, idle_for: datetime.timedelta, limit: int, dry_run: bool) -> None:
+        games: list[Game] = []
+        for shard in settings.GAME_SHARDS:
+            with use_game_shard(shard):
+                games.extend(get_finished_games(idle_for)[:limit])
+        games = games[:limit]
+        for game in games:
+            if dry_run:
+                self.stdout.write(f"Would archive game {game.id}")
+                continue
+            try:
+                name: str = archive_game(game)
+            except ValueError as e:
+                # Played again since it was listed
+                self.stderr.write(str(e))
+                continue
+            self.stdout.write(f"Archived game {game.id} to {name}")
+        self.stdout.write(f"{len(games)} games {'to archive' if dry_run else 'archived'}")
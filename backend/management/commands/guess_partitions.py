@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+
+from backend.partitions import (
+    DEFAULT_PARTITIONS_AHEAD,
+    GuessPartition,
+    detach_guess_partition,
+    ensure_guess_partitions,
+    list_guess_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Manages the round_id range partitions of the guess table: lists them, creates the "
+        "ones needed ahead of new rounds, or detaches an old one for archiving."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("action", choices=["list", "ensure", "detach"])
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=DEFAULT_PARTITIONS_AHEAD,
+            help="Partitions to have past the latest round, with ensure",
+        )
+        parser.add_argument("--name", help="Partition to detach, with detach")
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS, help="Game shard to manage the table of"
+        )
+
+    def handle(self, *args, **options) -> None:
+        action: str = options["action"]
+        if action == "ensure":
+            for name in ensure_guess_partitions(ahead=options["ahead"], using=options["database"]):
+                self.stdout.write(f"Created {name}")
+        elif action == "detach":
+            if not options["name"]:
+                raise CommandError("--name is required to detach a partition")
+            try:
+                detach_guess_partition(options["name"], using=options["database"])
+            except (ValueError, DatabaseError) as e:
+                raise CommandError(str(e)) from e
+            self.stdout.write(f"Detached {options['name']}, it can be archived and dropped")
+
+        self._list(options["database"])
+
+    def _list(self, using: str) -> None:
+        partitions: list[GuessPartition] = list_guess_partitions(using)
+        if not partitions:
+            raise CommandError("The guess table is not partitioned")
+        self.stdout.write(f"{'partition':<32}{'rounds from':>18}{'to':>18}{'~rows':>14}")
+        for p in partitions:
+            lower: str = "-" if p.lower_round_id is None else str(p.lower_round_id)
+            upper: str = "-" if p.upper_round_id is None else str(p.upper_round_id)
+            if p.is_default:
+                lower, upper = "default", "default"
+            self.stdout.write(f"{p.name:<32}{lower:>18}{upper:>18}{p.estimated_rows:>14}")
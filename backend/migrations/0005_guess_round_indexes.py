@@ -0,0 +1,86 @@
+# Generated by Django 4.0.3 on 2026-10-19 01:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+SINGLE_COLUMN_INDEXED_FIELDS = ['status', 'type']
+
+
+def drop_single_column_indexes(apps, schema_editor):
+    model = apps.get_model('backend', 'Guess')
+    table = model._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        constraints = schema_editor.connection.introspection.get_constraints(cursor, table)
+    for name, constraint in constraints.items():
+        if (
+            constraint['index']
+            and not constraint['unique']
+            and not constraint['primary_key']
+            and constraint['columns'] in ([column] for column in SINGLE_COLUMN_INDEXED_FIELDS)
+        ):
+            schema_editor.execute(
+                'DROP INDEX CONCURRENTLY IF EXISTS %s' % schema_editor.quote_name(name)
+            )
+
+
+def create_single_column_indexes(apps, schema_editor):
+    model = apps.get_model('backend', 'Guess')
+    table = model._meta.db_table
+    for column in SINGLE_COLUMN_INDEXED_FIELDS:
+        # The name Django gives to a db_index=True index
+        name = schema_editor._create_index_name(table, [column], suffix='')
+        schema_editor.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS %s ON %s (%s)'
+            % (
+                schema_editor.quote_name(name),
+                schema_editor.quote_name(table),
+                schema_editor.quote_name(column),
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built and dropped CONCURRENTLY, which can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('backend', '0004_round_is_ended_alter_round_unique_together'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='guess',
+            index=models.Index(fields=['round', 'status', 'type'], name='guess_round_status_type_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='guess',
+            index=models.Index(fields=['round', 'id'], name='guess_round_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='phrase',
+            index=models.Index(fields=['game', 'id'], name='phrase_game_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='round',
+            index=models.Index(fields=['game', 'is_ended'], name='round_game_is_ended_idx'),
+        ),
+        # Only once the composite index above exists, so judging guesses always has an index
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='guess',
+                    name='status',
+                    field=models.IntegerField(),
+                ),
+                migrations.AlterField(
+                    model_name='guess',
+                    name='type',
+                    field=models.IntegerField(),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(drop_single_column_indexes, create_single_column_indexes),
+            ],
+        ),
+    ]
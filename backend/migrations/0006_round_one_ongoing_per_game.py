@@ -0,0 +1,44 @@
+# Generated by Django 4.0.3 on 2026-10-19 01:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # The unique index is built CONCURRENTLY, which can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('backend', '0005_guess_round_indexes'),
+    ]
+
+    operations = [
+        # Rounds created by racing requests before the constraint existed, keep the latest going
+        migrations.RunSQL(
+            '''
+            UPDATE backend_round SET is_ended = true
+            WHERE NOT is_ended AND EXISTS (
+                SELECT 1 FROM backend_round later
+                WHERE later.game_id = backend_round.game_id
+                AND NOT later.is_ended
+                AND later.id > backend_round.id
+            )
+            ''',
+            migrations.RunSQL.noop,
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='round',
+                    constraint=models.UniqueConstraint(condition=models.Q(('is_ended', False)), fields=('game',), name='round_one_ongoing_per_game'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "round_one_ongoing_per_game" '
+                    'ON "backend_round" ("game_id") WHERE NOT "is_ended"',
+                    'DROP INDEX CONCURRENTLY IF EXISTS "round_one_ongoing_per_game"',
+                ),
+            ],
+        ),
+    ]
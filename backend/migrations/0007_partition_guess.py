@@ -0,0 +1,172 @@
+# Converts backend_guess in place into a table range partitioned by round_id.
+#
+# The existing table becomes the first partition, backend_guess_legacy, covering every round
+# up to the next GUESS_PARTITION_ROUNDS boundary. The migration runs in one transaction, so its
+# locks on the table are held until it commits. Building a unique (id, round_id) index, if
+# there isn't one, blocks writes. Every later step runs under the ACCESS EXCLUSIVE lock taken
+# by swapping the primary key, which blocks reads too, including a full scan of the table to
+# validate its bounds. On a large live table, build the index beforehand so that only the
+# scan runs under the locks:
+#
+#   CREATE UNIQUE INDEX CONCURRENTLY backend_guess_id_round_id ON backend_guess (id, round_id);
+#
+# Partitioned tables need the partition key in their primary key, so it is (id, round_id) in
+# the database. id stays unique through its sequence, and Django keeps seeing it as the key.
+
+from django.db import migrations
+
+GUESS_TABLE = 'backend_guess'
+LEGACY_PARTITION = 'backend_guess_legacy'
+PARTITION_KEY_INDEX = 'backend_guess_id_round_id'
+GUESS_PARTITION_ROUNDS = 100000
+PARTITIONS_AHEAD = 2
+
+
+def _fetch(schema_editor, sql, params=None):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def partition_guess_table(apps, schema_editor):
+    quote = schema_editor.quote_name
+    indexes = _fetch(
+        schema_editor,
+        "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN (%s, %s)",
+        [GUESS_TABLE, GUESS_TABLE + '_pkey', PARTITION_KEY_INDEX],
+    )
+    foreign_keys = _fetch(
+        schema_editor,
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [GUESS_TABLE],
+    )
+    last_round_id = _fetch(
+        schema_editor,
+        "SELECT GREATEST(COALESCE(MAX(round_id), 0), "
+        "(SELECT COALESCE(last_value, 0) FROM pg_sequences WHERE sequencename = 'backend_round_id_seq')) "
+        "FROM " + quote(GUESS_TABLE),
+    )[0][0]
+    legacy_upper = (last_round_id // GUESS_PARTITION_ROUNDS + 1) * GUESS_PARTITION_ROUNDS
+
+    # The partition needs the same primary key as the partitioned table
+    schema_editor.execute(
+        'CREATE UNIQUE INDEX IF NOT EXISTS %s ON %s (id, round_id)'
+        % (quote(PARTITION_KEY_INDEX), quote(GUESS_TABLE))
+    )
+    _replace_primary_key(schema_editor, GUESS_TABLE, PARTITION_KEY_INDEX)
+
+    # Free the names of the table, its indexes and its primary key for the partitioned table
+    schema_editor.execute('ALTER TABLE %s RENAME TO %s' % (quote(GUESS_TABLE), quote(LEGACY_PARTITION)))
+    schema_editor.execute(
+        'ALTER TABLE %s RENAME CONSTRAINT %s TO %s'
+        % (quote(LEGACY_PARTITION), quote(GUESS_TABLE + '_pkey'), quote(LEGACY_PARTITION + '_pkey'))
+    )
+    for name, _ in indexes:
+        schema_editor.execute('ALTER INDEX %s RENAME TO %s' % (quote(name), quote(_legacy_name(name))))
+
+    schema_editor.execute(
+        'CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (round_id)'
+        % (quote(GUESS_TABLE), quote(LEGACY_PARTITION))
+    )
+    schema_editor.execute('ALTER TABLE %s ADD PRIMARY KEY (id, round_id)' % quote(GUESS_TABLE))
+    schema_editor.execute('ALTER SEQUENCE backend_guess_id_seq OWNED BY %s.id' % quote(GUESS_TABLE))
+    # Same definitions as the legacy table's, so attaching it reuses its indexes and constraints
+    for name, definition in indexes:
+        schema_editor.execute(definition)
+    for name, definition in foreign_keys:
+        schema_editor.execute(
+            'ALTER TABLE %s ADD CONSTRAINT %s %s' % (quote(GUESS_TABLE), quote(name), definition)
+        )
+
+    # ATTACH PARTITION skips its own scan given a validated check constraint proving the bounds.
+    # The validation scans the table, still under the ACCESS EXCLUSIVE lock taken above
+    schema_editor.execute(
+        'ALTER TABLE %s ADD CONSTRAINT backend_guess_legacy_bound CHECK (round_id < %d) NOT VALID'
+        % (quote(LEGACY_PARTITION), legacy_upper)
+    )
+    schema_editor.execute(
+        'ALTER TABLE %s VALIDATE CONSTRAINT backend_guess_legacy_bound' % quote(LEGACY_PARTITION)
+    )
+    schema_editor.execute(
+        'ALTER TABLE %s ATTACH PARTITION %s FOR VALUES FROM (MINVALUE) TO (%d)'
+        % (quote(GUESS_TABLE), quote(LEGACY_PARTITION), legacy_upper)
+    )
+    schema_editor.execute(
+        'ALTER TABLE %s DROP CONSTRAINT backend_guess_legacy_bound' % quote(LEGACY_PARTITION)
+    )
+
+    for i in range(PARTITIONS_AHEAD):
+        lower = legacy_upper + i * GUESS_PARTITION_ROUNDS
+        schema_editor.execute(
+            'CREATE TABLE %s PARTITION OF %s FOR VALUES FROM (%d) TO (%d)'
+            % (quote('%s_r%d' % (GUESS_TABLE, lower)), quote(GUESS_TABLE), lower, lower + GUESS_PARTITION_ROUNDS)
+        )
+
+
+def unpartition_guess_table(apps, schema_editor):
+    quote = schema_editor.quote_name
+    partitions = [
+        name
+        for name, in _fetch(
+            schema_editor,
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass',
+            [GUESS_TABLE],
+        )
+    ]
+    if LEGACY_PARTITION not in partitions:
+        raise RuntimeError('%s was detached, it has to be attached back first' % LEGACY_PARTITION)
+    indexes = _fetch(
+        schema_editor,
+        "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+        [LEGACY_PARTITION, LEGACY_PARTITION + '_pkey'],
+    )
+
+    schema_editor.execute(
+        'ALTER TABLE %s DETACH PARTITION %s' % (quote(GUESS_TABLE), quote(LEGACY_PARTITION))
+    )
+    # Guesses of the rounds created since
+    schema_editor.execute(
+        'INSERT INTO %s SELECT * FROM %s' % (quote(LEGACY_PARTITION), quote(GUESS_TABLE))
+    )
+    schema_editor.execute('ALTER SEQUENCE backend_guess_id_seq OWNED BY %s.id' % quote(LEGACY_PARTITION))
+    schema_editor.execute('DROP TABLE %s' % quote(GUESS_TABLE))
+
+    schema_editor.execute('ALTER TABLE %s RENAME TO %s' % (quote(LEGACY_PARTITION), quote(GUESS_TABLE)))
+    schema_editor.execute(
+        'ALTER TABLE %s RENAME CONSTRAINT %s TO %s'
+        % (quote(GUESS_TABLE), quote(LEGACY_PARTITION + '_pkey'), quote(GUESS_TABLE + '_pkey'))
+    )
+    schema_editor.execute(
+        'CREATE UNIQUE INDEX %s ON %s (id)' % (quote(GUESS_TABLE + '_id'), quote(GUESS_TABLE))
+    )
+    _replace_primary_key(schema_editor, GUESS_TABLE, GUESS_TABLE + '_id')
+    for name, in indexes:
+        if name.endswith('_legacy'):
+            schema_editor.execute('ALTER INDEX %s RENAME TO %s' % (quote(name), quote(name[: -len('_legacy')])))
+
+
+def _replace_primary_key(schema_editor, table, unique_index):
+    # The index becomes the primary key, renamed after it
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        'ALTER TABLE %s DROP CONSTRAINT %s, ADD CONSTRAINT %s PRIMARY KEY USING INDEX %s'
+        % (quote(table), quote(table + '_pkey'), quote(table + '_pkey'), quote(unique_index))
+    )
+
+
+def _legacy_name(name):
+    # Index names are limited to 63 characters
+    return name[: 63 - len('_legacy')] + '_legacy'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0006_round_one_ongoing_per_game'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_guess_table, unpartition_guess_table),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-19 01:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0007_partition_guess'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Moves the id sequences of a game shard other than "default" to the ids range of the shard,
+# see common.dbrouting, and creates the guess partitions of its first rounds. Set up a new
+# shard with `manage.py migrate --database shard_<n>` once it is in DB_SHARDS.
+
+from django.conf import settings
+from django.db import migrations
+
+SHARD_ID_BITS = 48
+SHARDED_TABLES = ['backend_game', 'backend_phrase', 'backend_team', 'backend_round', 'backend_guess']
+GUESS_PARTITION_ROUNDS = 100000
+PARTITIONS_AHEAD = 2
+
+
+def move_to_shard_id_range(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    if alias not in settings.GAME_SHARDS or settings.GAME_SHARDS.index(alias) == 0:
+        return
+    quote = schema_editor.quote_name
+    first_id = settings.GAME_SHARDS.index(alias) << SHARD_ID_BITS
+    with schema_editor.connection.cursor() as cursor:
+        for table in SHARDED_TABLES:
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s, false) "
+                "WHERE (SELECT COALESCE(MAX(id), 0) FROM " + quote(table) + ") < %s",
+                [table, first_id, first_id],
+            )
+
+    for i in range(PARTITIONS_AHEAD + 1):
+        lower = first_id + i * GUESS_PARTITION_ROUNDS
+        schema_editor.execute(
+            'CREATE TABLE IF NOT EXISTS %s PARTITION OF backend_guess FOR VALUES FROM (%d) TO (%d)'
+            % (quote('backend_guess_r%d' % lower), lower, lower + GUESS_PARTITION_ROUNDS)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0008_game_archived_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_to_shard_id_range, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.0.3 on 2026-10-19 01:22
+
+from django.db import migrations, models
+
+# A single statement rewrites the table once, and checks the constraints while doing so,
+# instead of a rewrite per column and a scan per constraint. It holds an ACCESS EXCLUSIVE lock
+# on the guess table for the whole rewrite.
+COMPACT_COLUMNS_SQL = """
+ALTER TABLE "backend_guess"
+    ALTER COLUMN "type" TYPE smallint USING "type"::smallint,
+    ALTER COLUMN "status" TYPE smallint USING "status"::smallint,
+    ALTER COLUMN "score" TYPE smallint USING "score"::smallint,
+    ADD CONSTRAINT "guess_type_valid" CHECK ("type" IN (1, 2, 3)),
+    ADD CONSTRAINT "guess_status_valid" CHECK ("status" IN (1, 2, 3)),
+    ADD CONSTRAINT "guess_letter_value_single_char" CHECK ((NOT ("type" = 1) OR LENGTH("value") <= 1))
+"""
+# Letter guesses were only checked for length before being uppercased, which lengthens some,
+# e.g. "ß" to "SS". They are cut to their first character, for the constraint to hold.
+TRUNCATE_LETTER_VALUES_SQL = """
+UPDATE "backend_guess" SET "value" = LEFT("value", 1) WHERE "type" = 1 AND LENGTH("value") > 1
+"""
+WIDE_COLUMNS_SQL = """
+ALTER TABLE "backend_guess"
+    DROP CONSTRAINT "guess_type_valid",
+    DROP CONSTRAINT "guess_status_valid",
+    DROP CONSTRAINT "guess_letter_value_single_char",
+    ALTER COLUMN "type" TYPE integer USING "type"::integer,
+    ALTER COLUMN "status" TYPE integer USING "status"::integer,
+    ALTER COLUMN "score" TYPE integer USING "score"::integer
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0009_game_shard_id_ranges'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(TRUNCATE_LETTER_VALUES_SQL, migrations.RunSQL.noop),
+                migrations.RunSQL(COMPACT_COLUMNS_SQL, WIDE_COLUMNS_SQL),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='guess',
+                    name='score',
+                    field=models.SmallIntegerField(),
+                ),
+                migrations.AlterField(
+                    model_name='guess',
+                    name='status',
+                    field=models.SmallIntegerField(),
+                ),
+                migrations.AlterField(
+                    model_name='guess',
+                    name='type',
+                    field=models.SmallIntegerField(),
+                ),
+                migrations.AddConstraint(
+                    model_name='guess',
+                    constraint=models.CheckConstraint(check=models.Q(('type__in', [1, 2, 3])), name='guess_type_valid'),
+                ),
+                migrations.AddConstraint(
+                    model_name='guess',
+                    constraint=models.CheckConstraint(check=models.Q(('status__in', [1, 2, 3])), name='guess_status_valid'),
+                ),
+                migrations.AddConstraint(
+                    model_name='guess',
+                    constraint=models.CheckConstraint(check=models.Q(models.Q(('type', 1), _negated=True), ('value__length__lte', 1), _connector='OR'), name='guess_letter_value_single_char'),
+                ),
+            ],
+        ),
+    ]
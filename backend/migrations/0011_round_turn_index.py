@@ -0,0 +1,41 @@
+# Rounds now keep the index of the team whose turn it is in their configs, passed along as wrong
+# and timed out guesses are made. Ongoing rounds get theirs from the guesses made so far.
+
+from django.db import migrations
+from django.db.models import Count, Q
+
+WRONG = 2
+TIMED_OUT = 3
+
+
+def set_turn_index(apps, schema_editor):
+    Round = apps.get_model('backend', 'Round')
+    rounds = (
+        Round.objects.using(schema_editor.connection.alias)
+        .filter(is_ended=False)
+        .annotate(passed_turns=Count('guess', filter=Q(guess__status__in=[WRONG, TIMED_OUT])))
+    )
+    for game_round in rounds:
+        team_ids_ordering = game_round.configs.get('team_ids_ordering', [])
+        game_round.configs['turn_index'] = (
+            game_round.passed_turns % len(team_ids_ordering) if team_ids_ordering else 0
+        )
+        game_round.save(update_fields=['configs'])
+
+
+def unset_turn_index(apps, schema_editor):
+    Round = apps.get_model('backend', 'Round')
+    for game_round in Round.objects.using(schema_editor.connection.alias).filter(configs__has_key='turn_index'):
+        del game_round.configs['turn_index']
+        game_round.save(update_fields=['configs'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0010_guess_compact_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_turn_index, unset_turn_index),
+    ]
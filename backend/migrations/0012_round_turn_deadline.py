@@ -0,0 +1,22 @@
+# Generated by Django 4.0.3 on 2026-10-19 01:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0011_round_turn_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='round',
+            name='turn_deadline',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='round',
+            index=models.Index(condition=models.Q(('is_ended', False), ('turn_deadline__isnull', False)), fields=['turn_deadline'], name='round_turn_deadline_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.0.3 on 2026-10-19 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0012_round_turn_deadline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField()),
+                ('key', models.CharField(max_length=64)),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('response', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='idempotencyrecord',
+            index=models.Index(fields=['created_at'], name='idempotency_created_at_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencyrecord',
+            constraint=models.UniqueConstraint(fields=('user_id', 'key'), name='idempotency_user_key_unique'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.0.3 on 2026-10-19 01:32
+#
+# Phrases get a normalized key, unique per game. Duplicates of a phrase in a game, which were
+# allowed until now, are deleted unless a round was played on them. Those played are kept, the
+# first one holding the key and the others none. The values of the key holders are normalized
+# too, letters being judged and masked on them.
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+BATCH_SIZE = 1000
+
+
+def normalize_phrase(value):
+    # As backend.models.normalize_phrase
+    return ' '.join(value.split()).upper()
+
+
+def set_normalized_values(apps, schema_editor):
+    Phrase = apps.get_model('backend', 'Phrase')
+    Round = apps.get_model('backend', 'Round')
+    phrases = (
+        Phrase.objects.using(schema_editor.connection.alias)
+        .annotate(is_played=Exists(Round.objects.filter(phrase=OuterRef('pk'))))
+        .order_by('game_id', '-is_played', 'id')
+    )
+    keys = set()
+    to_update = []
+    to_delete = []
+    for phrase in phrases.iterator(chunk_size=BATCH_SIZE):
+        key = (phrase.game_id, normalize_phrase(phrase.value))
+        if key not in keys:
+            keys.add(key)
+            phrase.value = phrase.normalized_value = key[1]
+            to_update.append(phrase)
+        elif not phrase.is_played:
+            to_delete.append(phrase.id)
+    Phrase.objects.using(schema_editor.connection.alias).bulk_update(
+        to_update, ['value', 'normalized_value'], batch_size=BATCH_SIZE
+    )
+    for i in range(0, len(to_delete), BATCH_SIZE):
+        Phrase.objects.using(schema_editor.connection.alias).filter(id__in=to_delete[i : i + BATCH_SIZE]).delete()
+    # Checks the deferred foreign keys of the deletions now, the table can't be altered after
+    # with them pending
+    schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0013_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phrase',
+            name='normalized_value',
+            field=models.CharField(max_length=200, null=True),
+        ),
+        migrations.RunPython(set_normalized_values, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='phrase',
+            constraint=models.UniqueConstraint(fields=('game', 'normalized_value'), name='phrase_game_normalized_value_unique'),
+        ),
+    ]
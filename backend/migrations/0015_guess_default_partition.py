@@ -0,0 +1,38 @@
+# A DEFAULT partition for the guesses of rounds past the last range partition, so that inserting
+# them doesn't fail when `guess_partitions ensure` didn't run in time. Creating the missing
+# partition later moves its rows out of the default one, see backend.partitions.
+
+from django.db import migrations
+
+GUESS_TABLE = 'backend_guess'
+DEFAULT_PARTITION = 'backend_guess_default'
+
+
+def create_default_partition(apps, schema_editor):
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        'CREATE TABLE %s PARTITION OF %s DEFAULT' % (quote(DEFAULT_PARTITION), quote(GUESS_TABLE))
+    )
+
+
+def drop_default_partition(apps, schema_editor):
+    quote = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM %s)' % quote(DEFAULT_PARTITION))
+        if cursor.fetchone()[0]:
+            raise RuntimeError(
+                '%s holds guesses, create their partitions with `guess_partitions ensure` first'
+                % DEFAULT_PARTITION
+            )
+    schema_editor.execute('DROP TABLE %s' % quote(DEFAULT_PARTITION))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0014_phrase_normalized_value'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_partition, drop_default_partition),
+    ]
@@ -0,0 +1,21 @@
+# Games are listed newest first by created_at, ids being only ordered within a shard.
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built CONCURRENTLY, which can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('backend', '0015_guess_default_partition'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='game',
+            index=models.Index(fields=['-created_at', '-id'], name='game_created_at_id_idx'),
+        ),
+    ]
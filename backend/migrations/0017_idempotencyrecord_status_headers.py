@@ -0,0 +1,23 @@
+# Retries get the status and headers of the first response back, along with its data.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0016_game_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencyrecord',
+            name='status',
+            field=models.PositiveSmallIntegerField(default=200),
+        ),
+        migrations.AddField(
+            model_name='idempotencyrecord',
+            name='headers',
+            field=models.JSONField(default=dict),
+        ),
+    ]
@@ -2,8 +2,12 @@ from __future__ import annotations
 
 import enum
 from dataclasses import dataclass
+from typing import Optional
 
 from django.db import models
+from django.db.models.functions import Length
+
+models.CharField.register_lookup(Length)
 
 
 class Ordering(enum.IntEnum):
@@ -15,18 +19,26 @@ class Ordering(enum.IntEnum):
 class GameConfigs:
     phrase_order: Ordering
     team_order: Ordering
+    # Only accept guesses from the team whose turn it is
+    enforce_turns: bool = False
+    # Time a team has to guess before the turn times out, None to leave it to the clients
+    turn_seconds: Optional[int] = None
 
     @classmethod
     def from_dict(cls, to_parse: dict) -> GameConfigs:
         return GameConfigs(
             phrase_order=Ordering(to_parse.get("phrase_order", Ordering.ordered.value)),
             team_order=Ordering(to_parse.get("team_order", Ordering.ordered.value)),
+            enforce_turns=to_parse.get("enforce_turns", False),
+            turn_seconds=to_parse.get("turn_seconds"),
         )
 
     def to_dict(self) -> dict:
         return {
             "phrase_order": self.phrase_order.value,
             "team_order": self.team_order.value,
+            "enforce_turns": self.enforce_turns,
+            "turn_seconds": self.turn_seconds,
         }
 
 
@@ -37,6 +49,14 @@ class Game(models.Model):
     created_by_id = models.IntegerField()
     updated_at = models.DateTimeField(auto_now=True)
     updated_by_id = models.IntegerField()
+    # Its phrases, teams, rounds and guesses were moved to an archive, see backend.archives
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Newest games first, when listing them
+            models.Index(fields=["-created_at", "-id"], name="game_created_at_id_idx"),
+        ]
 
     @property
     def config_object(self) -> GameConfigs:
@@ -47,14 +67,36 @@ class Game(models.Model):
         self.configs = val.to_dict()
 
 
+def normalize_phrase(value: str) -> str:
+    """The key phrases and phrase guesses are compared by: uppercased, whitespace collapsed."""
+    return " ".join(value.split()).upper()
+
+
 class Phrase(models.Model):
     game = models.ForeignKey(Game, on_delete=models.CASCADE)
     value = models.CharField(max_length=200)
+    # normalize_phrase(value), unique per game. None for the duplicates played before it was
+    # enforced, see migration 0014
+    normalized_value = models.CharField(max_length=200, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     created_by_id = models.IntegerField()
     updated_at = models.DateTimeField(auto_now=True)
     updated_by_id = models.IntegerField()
 
+    @property
+    def key(self) -> str:
+        return self.normalized_value or normalize_phrase(self.value)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["game", "id"], name="phrase_game_id_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["game", "normalized_value"], name="phrase_game_normalized_value_unique"
+            ),
+        ]
+
 
 class Team(models.Model):
     game = models.ForeignKey(Game, on_delete=models.CASCADE)
@@ -68,16 +110,41 @@ class Team(models.Model):
 @dataclass
 class RoundConfigs:
     team_ids_ordering: list[int]
+    # Index in team_ids_ordering of the team whose turn it is, kept up to date as guesses are
+    # judged
+    turn_index: int = 0
+    # Turns timed out in a row, without any guess made
+    timed_out_turns: int = 0
 
     @classmethod
     def from_dict(cls, to_parse: dict) -> RoundConfigs:
-        return RoundConfigs(team_ids_ordering=to_parse.get("team_ids_ordering", []))
+        return RoundConfigs(
+            team_ids_ordering=to_parse.get("team_ids_ordering", []),
+            turn_index=to_parse.get("turn_index", 0),
+            timed_out_turns=to_parse.get("timed_out_turns", 0),
+        )
 
     def to_dict(self) -> dict:
         return {
             "team_ids_ordering": self.team_ids_ordering,
+            "turn_index": self.turn_index,
+            "timed_out_turns": self.timed_out_turns,
         }
 
+    @property
+    def current_team_id(self) -> Optional[int]:
+        if not self.team_ids_ordering:
+            return None
+        return self.team_ids_ordering[self.turn_index % len(self.team_ids_ordering)]
+
+    def pass_turn(self) -> None:
+        if self.team_ids_ordering:
+            self.turn_index = (self.turn_index + 1) % len(self.team_ids_ordering)
+
+
+# At most one round of a game is not ended
+ONGOING_ROUND_CONSTRAINT: str = "round_one_ongoing_per_game"
+
 
 class Round(models.Model):
     game = models.ForeignKey(Game, on_delete=models.CASCADE)
@@ -85,6 +152,8 @@ class Round(models.Model):
     is_ended = models.BooleanField(default=False)
     phrase = models.ForeignKey(Phrase, on_delete=models.CASCADE)
     configs = models.JSONField(default=dict)
+    # When the current turn times out, set while the round is ongoing if the game has turn_seconds
+    turn_deadline = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     created_by_id = models.IntegerField()
     updated_at = models.DateTimeField(auto_now=True)
@@ -100,6 +169,20 @@ class Round(models.Model):
 
     class Meta:
         unique_together = [("game", "phrase")]
+        indexes = [
+            models.Index(fields=["game", "is_ended"], name="round_game_is_ended_idx"),
+            # Upcoming deadlines, for the turn timer
+            models.Index(
+                fields=["turn_deadline"],
+                condition=models.Q(is_ended=False, turn_deadline__isnull=False),
+                name="round_turn_deadline_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["game"], condition=models.Q(is_ended=False), name=ONGOING_ROUND_CONSTRAINT
+            ),
+        ]
 
 
 SCORE_PER_LETTERS: int = 1
@@ -121,9 +204,57 @@ class GuessStatus(enum.IntEnum):
 class Guess(models.Model):
     round = models.ForeignKey(Round, on_delete=models.CASCADE)
     team = models.ForeignKey(Team, on_delete=models.CASCADE)
-    type = models.IntegerField(db_index=True)
-    status = models.IntegerField(db_index=True)
+    # GuessType, GuessStatus
+    type = models.SmallIntegerField()
+    status = models.SmallIntegerField()
+    # A single letter for letter guesses, stored in 2 bytes
     value = models.CharField(max_length=200)
-    score = models.IntegerField()
+    score = models.SmallIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
     created_by_id = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            # Correct letter guesses of a round, when judging a guess
+            models.Index(fields=["round", "status", "type"], name="guess_round_status_type_idx"),
+            # Guesses of a round in order, when listing them
+            models.Index(fields=["round", "id"], name="guess_round_id_idx"),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(type__in=[t.value for t in GuessType]), name="guess_type_valid"
+            ),
+            models.CheckConstraint(
+                check=models.Q(status__in=[s.value for s in GuessStatus]),
+                name="guess_status_valid",
+            ),
+            models.CheckConstraint(
+                check=~models.Q(type=GuessType.letter.value) | models.Q(value__length__lte=1),
+                name="guess_letter_value_single_char",
+            ),
+        ]
+
+
+IDEMPOTENCY_KEY_MAX_LENGTH: int = 64
+
+
+class IdempotencyRecord(models.Model):
+    """The response to a request sent with an Idempotency-Key, replayed to its retries."""
+
+    user_id = models.IntegerField()
+    key = models.CharField(max_length=IDEMPOTENCY_KEY_MAX_LENGTH)
+    # sha1 of the method, path and data, so that a key can't be reused for another request
+    fingerprint = models.CharField(max_length=40)
+    response = models.JSONField(default=dict)
+    status = models.PositiveSmallIntegerField(default=200)
+    headers = models.JSONField(default=dict)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_id", "key"], name="idempotency_user_key_unique"),
+        ]
+        indexes = [
+            # Expired records, when purging
+            models.Index(fields=["created_at"], name="idempotency_created_at_idx"),
+        ]
@@ -0,0 +1,184 @@
+"""
+Range partitions of the guess table by round_id, see migration 0007.
+
+The table converted in place is kept as the first partition, `backend_guess_legacy`, holding
+every round up to the one the migration ran at. Later partitions hold GUESS_PARTITION_ROUNDS
+rounds each and are named after their lower bound. `manage.py guess_partitions ensure` creates
+them ahead, and `archive_games --loop` runs it regularly. Guesses of rounds past the last one
+land in the DEFAULT partition, `backend_guess_default`, see migration 0015, and are moved out
+when their partition gets created.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from backend.models import Guess, Round
+
+GUESS_PARTITION_ROUNDS: int = 100_000
+DEFAULT_PARTITIONS_AHEAD: int = 2
+DEFAULT_PARTITION_BOUND: str = "DEFAULT"
+# How long changing the partitions waits for the queries running on the guess table
+PARTITION_LOCK_TIMEOUT: str = "5s"
+
+_BOUND_PATTERN: re.Pattern = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+@dataclass
+class GuessPartition:
+    name: str
+    # None when unbounded
+    lower_round_id: Optional[int]
+    upper_round_id: Optional[int]
+    estimated_rows: int
+    is_default: bool = False
+
+
+def list_guess_partitions(using: str = DEFAULT_DB_ALIAS) -> list[GuessPartition]:
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            """,
+            [Guess._meta.db_table],
+        )
+        rows: list[tuple] = cursor.fetchall()
+
+    partitions: list[GuessPartition] = []
+    for name, bound, estimated_rows in rows:
+        match: Optional[re.Match] = _BOUND_PATTERN.search(bound)
+        lower, upper = match.groups() if match else ("MINVALUE", "MAXVALUE")
+        partitions.append(
+            GuessPartition(
+                name=name,
+                lower_round_id=_parse_bound(lower),
+                upper_round_id=_parse_bound(upper),
+                estimated_rows=max(int(estimated_rows), 0),
+                is_default=bound == DEFAULT_PARTITION_BOUND,
+            )
+        )
+    # The default partition last
+    return sorted(
+        partitions,
+        key=lambda p: (p.is_default, -1 if p.lower_round_id is None else p.lower_round_id),
+    )
+
+
+def ensure_guess_partitions(
+    ahead: int = DEFAULT_PARTITIONS_AHEAD, using: str = DEFAULT_DB_ALIAS
+) -> list[str]:
+    """
+    Creates the partitions for the rounds up to `ahead` partitions past the latest round.
+    Returns the names of the partitions created.
+    """
+    partitions: list[GuessPartition] = list_guess_partitions(using)
+    if not partitions:
+        raise ValueError(f"{Guess._meta.db_table} is not partitioned")
+    last_round_id: int = _get_last_round_id(using)
+    # A shard's round ids start far past the partitions of migration 0007, skip the gap
+    upper: int = max(
+        max(p.upper_round_id or 0 for p in partitions),
+        last_round_id // GUESS_PARTITION_ROUNDS * GUESS_PARTITION_ROUNDS,
+    )
+    target: int = (last_round_id // GUESS_PARTITION_ROUNDS + 1 + ahead) * GUESS_PARTITION_ROUNDS
+
+    default: Optional[GuessPartition] = next((p for p in partitions if p.is_default), None)
+    created: list[str] = []
+    while upper < target:
+        name: str = f"{Guess._meta.db_table}_r{upper}"
+        _create_partition(name, upper, upper + GUESS_PARTITION_ROUNDS, default, using)
+        created.append(name)
+        upper += GUESS_PARTITION_ROUNDS
+    return created
+
+
+def detach_guess_partition(name: str, using: str = DEFAULT_DB_ALIAS) -> None:
+    """
+    Detaches a partition into a standalone table, for it to be archived and dropped.
+    Its guesses are no longer visible, so every one of its rounds must be ended.
+    """
+    partition: Optional[GuessPartition] = next(
+        (p for p in list_guess_partitions(using) if p.name == name), None
+    )
+    if partition is None:
+        raise ValueError(f"{name} is not a partition of {Guess._meta.db_table}")
+    if partition.is_default:
+        raise ValueError(f"{name} is the default partition, it can't be detached")
+
+    rounds = Round.objects.using(using).filter(is_ended=False)
+    if partition.lower_round_id is not None:
+        rounds = rounds.filter(id__gte=partition.lower_round_id)
+    if partition.upper_round_id is not None:
+        rounds = rounds.filter(id__lt=partition.upper_round_id)
+    if partition.upper_round_id is None or rounds.exists():
+        raise ValueError(f"{name} holds guesses of rounds still ongoing")
+
+    connection = connections[using]
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        # Not CONCURRENTLY, which a table with a DEFAULT partition refuses. The ACCESS EXCLUSIVE
+        # lock on the guess table is held for an instant, but it queues every guess query behind
+        # it while waiting for the running ones, so the wait is cut short
+        cursor.execute(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'")
+        cursor.execute(
+            f"ALTER TABLE {connection.ops.quote_name(Guess._meta.db_table)} "
+            f"DETACH PARTITION {connection.ops.quote_name(name)}"
+        )
+
+
+def _create_partition(
+    name: str, lower: int, upper: int, default: Optional[GuessPartition], using: str
+) -> None:
+    connection = connections[using]
+    table: str = connection.ops.quote_name(Guess._meta.db_table)
+    partition: str = connection.ops.quote_name(name)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        if default is None:
+            cursor.execute(
+                f"CREATE TABLE {partition} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                [lower, upper],
+            )
+            return
+        # Its rows in the default partition would make creating it fail, they are moved over
+        # first, then the table is attached. The default partition is locked first, as attaching
+        # does anyway, so that no guess of the range lands there in between
+        default_partition: str = connection.ops.quote_name(default.name)
+        cursor.execute(
+            f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'")
+        cursor.execute(f"LOCK TABLE {default_partition} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {default_partition}
+                WHERE round_id >= %s AND round_id < %s
+                RETURNING *
+            )
+            INSERT INTO {partition} SELECT * FROM moved
+            """,
+            [lower, upper],
+        )
+        cursor.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {partition} FOR VALUES FROM (%s) TO (%s)",
+            [lower, upper],
+        )
+
+
+def _get_last_round_id(using: str) -> int:
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT last_value FROM pg_sequences WHERE sequencename = %s",
+            [f"{Round._meta.db_table}_id_seq"],
+        )
+        row: Optional[tuple] = cursor.fetchone()
+    return (row[0] or 0) if row else 0
+
+
+def _parse_bound(bound: str) -> Optional[int]:
+    if bound in ("MINVALUE", "MAXVALUE"):
+        return None
+    return int(bound.strip("'"))
@@ -61,6 +61,10 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "common.correlations.CorrelationMiddleware",
+    "common.profiling.ProfilingMiddleware",
+    "common.timings.RequestTimingMiddleware",
+    "common.metrics.MetricsMiddleware",
+    "common.dbrouting.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -90,7 +94,7 @@ TEMPLATES = [
 
 
 REST_FRAMEWORK = {
-    "DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",),
+    "DEFAULT_RENDERER_CLASSES": ("common.rest.renderers.JSONRenderer",),
     "DEFAULT_AUTHENTICATION_CLASSES": [],
     "DEFAULT_PAGINATION_CLASS": "common.rest.pagination.DefaultPageNumberPagination",
     "EXCEPTION_HANDLER": "common.rest.views.exception_handler",
@@ -104,6 +108,40 @@ SIMPLE_JWT = {
 }
 
 
+# Fan out round events to the other workers through Postgres LISTEN/NOTIFY
+EVENT_HUB_USE_PG_NOTIFY = os.environ.get("EVENT_HUB_USE_PG_NOTIFY", "0") == "1"
+
+
+LOGGER_CONFIG = {
+    "log_dir": os.environ.get("LOG_DIR", "./log"),
+    "log_format": os.environ.get("LOG_FORMAT", "text"),
+    "sampling": {
+        "main.exception_handler": {"INFO": float(os.environ.get("LOG_HANDLED_ERROR_RATE", "1"))},
+    },
+}
+
+
+# Bearer token Prometheus scrapes /metrics with. Without one, only local clients are served
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+
+# Requests profiled on demand with the X-Profile header, see common.profiling
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "./profiles")
+
+
+# Finished games moved out of the database, see backend.archives. Every process has to see the
+# same storage: ARCHIVE_DIR on a volume they all mount, or object storage through another
+# storage class, e.g. storages.backends.s3boto3.S3Boto3Storage of django-storages
+ARCHIVE_STORAGE = os.environ.get("ARCHIVE_STORAGE", "django.core.files.storage.FileSystemStorage")
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "./archives")
+ARCHIVE_CACHE_SIZE = int(os.environ.get("ARCHIVE_CACHE_SIZE", "128"))
+
+
+# Responses replayed to the retries of requests sent with an Idempotency-Key, see
+# api.rest.idempotency
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_KEY_TTL_SECONDS", "86400"))
+
+
 SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
 
 WSGI_APPLICATION = "backend.wsgi.application"
@@ -123,6 +161,51 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default database, as comma separated host[:port], see common.dbrouting
+DATABASE_REPLICAS = []
+for i, replica_host in enumerate(filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(","))):
+    replica_hostname, _, replica_port = replica_host.strip().partition(":")
+    DATABASE_REPLICAS.append(f"replica_{i}")
+    DATABASES[f"replica_{i}"] = {
+        **DATABASES["default"],
+        "HOST": replica_hostname,
+        "PORT": replica_port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+# Databases games are spread over besides the default one, as comma separated
+# host[:port]/name, see common.dbrouting. Only ever append to it, the position of a shard in
+# the list is part of the ids of its rows.
+GAME_SHARDS = ["default"]
+for shard_db in filter(None, os.environ.get("DB_SHARDS", "").split(",")):
+    shard_address, _, shard_name = shard_db.strip().partition("/")
+    shard_hostname, _, shard_port = shard_address.partition(":")
+    GAME_SHARDS.append(f"shard_{len(GAME_SHARDS)}")
+    DATABASES[GAME_SHARDS[-1]] = {
+        **DATABASES["default"],
+        "NAME": shard_name or DATABASES["default"]["NAME"],
+        "HOST": shard_hostname or DATABASES["default"]["HOST"],
+        "PORT": shard_port or DATABASES["default"]["PORT"],
+    }
+
+DATABASE_ROUTERS = ["common.dbrouting.DatabaseRouter"]
+
+# How long GET requests of a user who just wrote keep reading from the primary
+READ_YOUR_WRITES_SECONDS = int(os.environ.get("READ_YOUR_WRITES_SECONDS", "5"))
+# The cache the users who wrote recently are kept in. Shared by every process, it defaults to a
+# table of the primary, created with `manage.py createcachetable`
+READ_YOUR_WRITES_CACHE = "recent_writes"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    READ_YOUR_WRITES_CACHE: {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "recent_writes_cache",
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
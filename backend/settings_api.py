@@ -0,0 +1,49 @@
+"""
+Django settings for serving the REST API only.
+
+JWT authenticated API calls never touch sessions, messages, CSRF or the admin, so this
+profile leaves them out of INSTALLED_APPS and MIDDLEWARE and only routes api/.
+Run the admin from a separate process with the default `backend.settings`, e.g.
+
+    DJANGO_SETTINGS_MODULE=backend.settings_api gunicorn backend.wsgi
+    gunicorn backend.wsgi  # admin/
+"""
+
+# pylint: disable=wildcard-import, unused-wildcard-import
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "corsheaders",
+    "rest_framework",
+    "backend",
+    "api",
+]
+
+MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "common.correlations.CorrelationMiddleware",
+    "common.profiling.ProfilingMiddleware",
+    "common.timings.RequestTimingMiddleware",
+    "common.metrics.MetricsMiddleware",
+    "common.dbrouting.ReplicaRoutingMiddleware",
+    "corsheaders.middleware.CorsMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+
+ROOT_URLCONF = "backend.urls_api"
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.debug",
+                "django.template.context_processors.request",
+            ],
+        },
+    },
+]
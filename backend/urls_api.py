@@ -0,0 +1,10 @@
+"""backend URL Configuration for the API only settings profile, see backend/settings_api.py"""
+
+from django.urls import include, path
+
+from common.metrics import metrics_view
+
+urlpatterns = [
+    path("api/", include("api.urls")),
+    path("metrics", metrics_view),
+]
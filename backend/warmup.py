@@ -0,0 +1,75 @@
+import os
+
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from common.logger import log
+
+# Request handling settings that DRF only imports on first access
+LAZY_API_SETTINGS: list[str] = [
+    "DEFAULT_RENDERER_CLASSES",
+    "DEFAULT_PARSER_CLASSES",
+    "DEFAULT_AUTHENTICATION_CLASSES",
+    "DEFAULT_PERMISSION_CLASSES",
+    "DEFAULT_CONTENT_NEGOTIATION_CLASS",
+    "DEFAULT_PAGINATION_CLASS",
+    "EXCEPTION_HANDLER",
+]
+
+
+def warm_up() -> None:
+    """
+    Pays the costs a worker would otherwise put on its first requests: importing every view,
+    building serializer fields, resolving lazy DRF settings, initialising the logger and
+    connecting to the database. Meant to run right after a worker boots.
+    """
+    _warm_up_url_resolver()
+    _warm_up_serializers()
+    for name in LAZY_API_SETTINGS:
+        getattr(api_settings, name)
+    _warm_up_database_connection()
+    log.info("warm_up|pid=%s|done", os.getpid())
+
+
+def _warm_up_url_resolver() -> None:
+    resolver = get_resolver()
+    # Populating the reverse dict walks and imports every included URLconf and view
+    resolver.reverse_dict  # pylint: disable=pointless-statement
+
+
+def _warm_up_serializers() -> None:
+    for view_class in _iter_api_view_classes(get_resolver().url_patterns):
+        serializer_class = getattr(view_class, "serializer_class", None)
+        if serializer_class is None:
+            continue
+        try:
+            serializer_class().fields  # pylint: disable=expression-not-assigned
+        except Exception as e:  # pylint: disable=broad-except
+            log.warning("warm_up|serializer=%s|error=%s", serializer_class.__name__, e)
+
+
+def _iter_api_view_classes(url_patterns: list):
+    for pattern in url_patterns:
+        if hasattr(pattern, "url_patterns"):
+            yield from _iter_api_view_classes(pattern.url_patterns)
+            continue
+        view_class = getattr(pattern.callback, "cls", None)
+        if view_class is not None and issubclass(view_class, APIView):
+            yield view_class
+
+
+def _warm_up_database_connection() -> None:
+    # The primary and the read replicas
+    for alias in settings.DATABASES:
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+        except Exception as e:  # pylint: disable=broad-except
+            log.warning("warm_up|database=%s|connection failed|error=%s", alias, e)
+            continue
+        # Connections are per thread (greenlet under gevent), the request ones are opened on
+        # demand. This still loads the database backend and checks the server is reachable.
+        connection.close()
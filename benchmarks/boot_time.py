@@ -0,0 +1,89 @@
+"""
+Worker boot time: how long importing `backend.wsgi` takes, and which imports dominate it.
+
+Every sample runs in a fresh interpreter with `-X importtime`, the same work a newly forked
+or recycled gunicorn worker does before it can serve its first request.
+
+    python -m benchmarks.boot_time --runs 10 --top 25 --output boot.json
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+from benchmarks.utils import BASE_DIR, summarize, write_results
+
+BOOT_STATEMENT: str = "import backend.wsgi"
+# What the first request additionally pays for unless the worker was warmed up
+FIRST_REQUEST_STATEMENT: str = (
+    "import backend.wsgi; from django.urls import get_resolver; get_resolver().resolve('/api/games/')"
+)
+
+
+def measure_boot(statement: str) -> tuple[float, dict[str, int]]:
+    start: float = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=BASE_DIR,
+        capture_output=True,
+        check=True,
+    )
+    elapsed_ms: float = (time.perf_counter() - start) * 1000
+    return elapsed_ms, parse_importtime(completed.stderr.decode())
+
+
+def parse_importtime(output: str) -> dict[str, int]:
+    cumulative_us_by_module: dict[str, int] = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line.split("|")
+        cumulative_us_by_module[module.strip()] = int(cumulative_us)
+    return cumulative_us_by_module
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument(
+        "--first-request",
+        action="store_true",
+        help="Also resolve an API URL, importing the views like the first request does",
+    )
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    statement: str = FIRST_REQUEST_STATEMENT if args.first_request else BOOT_STATEMENT
+
+    wall_ms: list[float] = []
+    import_us: dict[str, list[int]] = {}
+    for _ in range(args.runs):
+        elapsed_ms, cumulative_us_by_module = measure_boot(statement)
+        wall_ms.append(elapsed_ms)
+        for module, cumulative_us in cumulative_us_by_module.items():
+            import_us.setdefault(module, []).append(cumulative_us)
+
+    median_import_ms: dict[str, float] = {
+        module: sorted(samples)[len(samples) // 2] / 1000 for module, samples in import_us.items()
+    }
+    slowest: list[tuple[str, float]] = sorted(
+        median_import_ms.items(), key=lambda item: item[1], reverse=True
+    )[: args.top]
+
+    boot_stats: dict[str, float] = summarize(wall_ms)
+    print(f"{statement}: p50={boot_stats['p50']:.1f}ms max={boot_stats['max']:.1f}ms")
+    print(f"{'cumulative ms':>14}  module")
+    for module, cumulative_ms in slowest:
+        print(f"{cumulative_ms:>14.1f}  {module}")
+
+    if args.output:
+        write_results(
+            args.output,
+            "boot_time",
+            {"wall_ms": boot_stats, "slowest_imports_ms": dict(slowest)},
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Game night load simulation: concurrent hosts running rounds against a running server.
+
+Seeds games, phrases and teams straight into the database the server uses, then every host
+thread runs the rounds of one game through the API: it creates a round, has the teams take
+turns at letter, phrase and timed-out guesses, and polls the leaderboard meanwhile. Latency
+and throughput are reported per endpoint. The same --seed gives the same games and guesses,
+so runs against different worker classes, caching modes or schemas can be compared.
+
+    DJANGO_SETTINGS_MODULE=backend.settings gunicorn backend.wsgi -b 127.0.0.1:8000 &
+    python -m benchmarks.game_night --games 20 --rounds 5 --output game_night.json
+"""
+
+import argparse
+import http.client
+import json
+import random
+import string
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from typing import Any, Optional
+
+from benchmarks.utils import setup_django, summarize, write_results
+
+USERNAME: str = "game_night"
+WORDS: list[str] = [
+    "APPLE",
+    "BRIDGE",
+    "CASTLE",
+    "DRAGON",
+    "ECLIPSE",
+    "FOREST",
+    "GALAXY",
+    "HARBOR",
+    "ISLAND",
+    "JUNGLE",
+    "KNIGHT",
+    "LANTERN",
+    "MOUNTAIN",
+    "NEBULA",
+    "OCEAN",
+    "PYRAMID",
+    "QUARTZ",
+    "RIVER",
+    "SUNSET",
+    "THUNDER",
+    "UMBRELLA",
+    "VOLCANO",
+    "WHISPER",
+    "YELLOW",
+    "ZEPHYR",
+]
+
+
+class LatencyRecorder:
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, milliseconds: float, is_error: bool) -> None:
+        with self._lock:
+            self.samples[endpoint].append(milliseconds)
+            if is_error:
+                self.errors[endpoint] += 1
+
+
+class ApiClient:
+    """One keep-alive connection per host, like a browser tab would use."""
+
+    def __init__(self, base_url: str, token: str, recorder: LatencyRecorder) -> None:
+        parsed: urllib.parse.ParseResult = urllib.parse.urlparse(base_url)
+        self.connection: http.client.HTTPConnection = http.client.HTTPConnection(
+            parsed.hostname, parsed.port or 80, timeout=60
+        )
+        self.headers: dict[str, str] = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+        self.recorder: LatencyRecorder = recorder
+
+    def request(self, endpoint: str, method: str, path: str, body: Optional[dict] = None) -> dict:
+        payload: Optional[str] = json.dumps(body) if body is not None else None
+        start: float = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=payload, headers=self.headers)
+            response: http.client.HTTPResponse = self.connection.getresponse()
+            data: dict = json.loads(response.read() or b"{}")
+        except (OSError, http.client.HTTPException, ValueError):
+            self.connection.close()
+            self.recorder.record(endpoint, (time.perf_counter() - start) * 1000, is_error=True)
+            return {}
+        is_error: bool = response.status != 200 or data.get("code") != 0
+        self.recorder.record(endpoint, (time.perf_counter() - start) * 1000, is_error)
+        return data
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def seed(rng: random.Random, games: int, phrases: int, teams: int) -> tuple[list[dict], str]:
+    # pylint: disable=import-outside-toplevel
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from backend.models import Game, GameConfigs, Ordering, Phrase, Team, normalize_phrase
+
+    user: User = User.objects.filter(username=USERNAME).first() or User.objects.create_user(
+        username=USERNAME, is_staff=True
+    )
+    audit: dict = {"created_by_id": user.id, "updated_by_id": user.id}
+    configs: dict = GameConfigs(
+        phrase_order=Ordering.ordered, team_order=Ordering.ordered
+    ).to_dict()
+
+    seeded: list[dict] = []
+    for i in range(games):
+        game: Game = Game.objects.create(name=f"game night {i}", configs=configs, **audit)
+        # Phrases are unique per game
+        values: set[str] = {" ".join(rng.sample(WORDS, rng.randint(1, 4))) for _ in range(phrases)}
+        game_phrases: list[Phrase] = Phrase.objects.bulk_create(
+            [
+                Phrase(game=game, value=v, normalized_value=normalize_phrase(v), **audit)
+                for v in sorted(values)
+            ]
+        )
+        game_teams: list[Team] = Team.objects.bulk_create(
+            [Team(game=game, name=f"team {j}", **audit) for j in range(teams)]
+        )
+        seeded.append(
+            {
+                "id": game.id,
+                "phrases": {p.id: p.value for p in game_phrases},
+                "team_ids": [t.id for t in game_teams],
+            }
+        )
+    return seeded, str(AccessToken.for_user(user))
+
+
+def delete_seeded(games: list[dict]) -> None:
+    from backend.models import Game  # pylint: disable=import-outside-toplevel
+
+    Game.objects.filter(id__in=[g["id"] for g in games]).delete()
+
+
+def run_host(
+    client: ApiClient,
+    rng: random.Random,
+    game: dict,
+    rounds: int,
+    max_guesses: int,
+    poll_every: int,
+) -> None:
+    game_path: str = f"/api/games/{game['id']}/"
+    for round_number in range(rounds):
+        created: dict = client.request(
+            "create round",
+            "POST",
+            f"{game_path}rounds/",
+            {"name": f"round {round_number}", "starting_team_id": rng.choice(game["team_ids"])},
+        )
+        round_id: Optional[int] = created.get("data", {}).get("id")
+        if round_id is None:
+            return
+        game_round: dict = client.request("get round", "GET", f"{game_path}rounds/{round_id}/")
+        # Already recorded as an error, the round can't be played without its phrase
+        if game_round.get("code") != 0:
+            return
+        team_ids: list[int] = game_round["data"]["team_ordering"] or game["team_ids"]
+        phrase: str = game["phrases"][game_round["data"]["phrase_id"]]
+        guesses_path: str = f"{game_path}rounds/{round_id}/guesses/"
+
+        for turn in range(max_guesses):
+            team_id: int = team_ids[turn % len(team_ids)]
+            is_last_turn: bool = turn == max_guesses - 1
+            body: dict = _next_guess(rng, team_id, phrase, is_last_turn)
+            judged: dict = client.request(_guess_endpoint(body["type"]), "POST", guesses_path, body)
+            if turn % poll_every == 0:
+                client.request("leaderboard", "GET", game_path)
+            if judged.get("data", {}).get("should_end"):
+                break
+
+
+def _next_guess(rng: random.Random, team_id: int, phrase: str, is_last_turn: bool) -> dict:
+    # 1: letter, 2: phrase, 3: timed out, as in backend.models.GuessType
+    if is_last_turn:
+        return {"team_id": team_id, "type": 2, "value": phrase}
+    roll: float = rng.random()
+    if roll < 0.1:
+        return {"team_id": team_id, "type": 3}
+    if roll < 0.2:
+        value: str = phrase if rng.random() < 0.3 else rng.choice(WORDS)
+        return {"team_id": team_id, "type": 2, "value": value}
+    letters: str = phrase.replace(" ", "") if rng.random() < 0.6 else string.ascii_uppercase
+    return {"team_id": team_id, "type": 1, "value": rng.choice(letters)}
+
+
+def _guess_endpoint(guess_type: int) -> str:
+    return {1: "guess letter", 2: "guess phrase", 3: "guess timed out"}[guess_type]
+
+
+def report(recorder: LatencyRecorder, elapsed: float) -> dict:
+    results: dict[str, Any] = {"elapsed_seconds": elapsed, "endpoints": {}}
+    print(
+        f"{'endpoint':<18}{'count':>8}{'errors':>8}{'req/s':>9}"
+        f"{'p50':>9}{'p95':>9}{'p99':>9}  (ms)"
+    )
+    for endpoint, samples in sorted(recorder.samples.items()):
+        stats: dict = summarize(samples)
+        stats["errors"] = recorder.errors[endpoint]
+        stats["throughput"] = len(samples) / elapsed
+        results["endpoints"][endpoint] = stats
+        print(
+            f"{endpoint:<18}{stats['count']:>8}{stats['errors']:>8}{stats['throughput']:>9.1f}"
+            f"{stats['p50']:>9.2f}{stats['p95']:>9.2f}{stats['p99']:>9.2f}"
+        )
+    total: int = sum(len(s) for s in recorder.samples.values())
+    results["throughput"] = total / elapsed
+    print(f"{total} requests in {elapsed:.1f}s, {results['throughput']:.1f} req/s")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--settings", help="Settings module of the database to seed")
+    parser.add_argument("--games", type=int, default=10, help="Games, each run by one host")
+    parser.add_argument("--phrases", type=int, default=20, help="Phrases per game")
+    parser.add_argument("--teams", type=int, default=4, help="Teams per game")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds per game")
+    parser.add_argument("--max-guesses", type=int, default=30, help="Guesses per round at most")
+    parser.add_argument("--poll-every", type=int, default=3, help="Guesses per leaderboard poll")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded games afterwards")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    args.rounds = min(args.rounds, args.phrases)
+
+    setup_django(args.settings)
+    rng: random.Random = random.Random(args.seed)
+    games, token = seed(rng, args.games, args.phrases, args.teams)
+    recorder: LatencyRecorder = LatencyRecorder()
+    clients: list[ApiClient] = [ApiClient(args.base_url, token, recorder) for _ in games]
+    hosts: list[threading.Thread] = [
+        threading.Thread(
+            target=run_host,
+            args=(
+                client,
+                random.Random(rng.random()),
+                game,
+                args.rounds,
+                args.max_guesses,
+                args.poll_every,
+            ),
+        )
+        for client, game in zip(clients, games)
+    ]
+
+    start: float = time.perf_counter()
+    try:
+        for host in hosts:
+            host.start()
+        for host in hosts:
+            host.join()
+        elapsed: float = time.perf_counter() - start
+    finally:
+        for client in clients:
+            client.close()
+        if not args.keep:
+            delete_seeded(games)
+
+    results: dict = report(recorder, elapsed)
+    results["params"] = {
+        k: v for k, v in vars(args).items() if k not in ("base_url", "output", "keep")
+    }
+    if args.output:
+        write_results(args.output, "game_night", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Microbenchmarks of the pure round logic in api.rest.rounds.judging, on in-memory fixtures.
+
+Covers judging letter and phrase guesses for phrases up to 200 characters, and the team
+ordering of a new round for up to 10k teams. With --baseline, the results are compared with
+an earlier run and the script fails when a case got slower than --tolerance allows.
+
+    python -m benchmarks.guess_logic --output guess_logic.json
+    python -m benchmarks.guess_logic --baseline guess_logic.json
+"""
+
+import argparse
+import json
+import random
+import string
+import sys
+import timeit
+from typing import Callable
+
+from benchmarks.utils import setup_django, write_results
+
+PHRASE_LENGTHS: list[int] = [10, 50, 200]
+TEAM_COUNTS: list[int] = [10, 100, 1000, 10000]
+
+
+def make_phrase(rng: random.Random, length: int) -> str:
+    words: list[str] = []
+    while sum(len(w) + 1 for w in words) < length:
+        words.append("".join(rng.choices(string.ascii_uppercase, k=rng.randint(2, 8))))
+    return " ".join(words)[:length].strip()
+
+
+def build_cases(rng: random.Random) -> dict[str, Callable[[], object]]:
+    # pylint: disable=import-outside-toplevel
+    from api.rest.rounds.judging import (
+        get_unguessed_letters,
+        judge_letter_guess,
+        judge_phrase_guess,
+        rotate_team_ids,
+    )
+
+    cases: dict[str, Callable[[], object]] = {}
+    for length in PHRASE_LENGTHS:
+        phrase: str = make_phrase(rng, length)
+        letters: list[str] = sorted(set(phrase.replace(" ", "")))
+        # Half of the letters found, as in the middle of a round
+        guessed: list[str] = letters[: len(letters) // 2]
+        letter: str = letters[-1]
+        cases[f"unguessed_letters/phrase={length}"] = lambda p=phrase, g=guessed: (
+            get_unguessed_letters(p, g)
+        )
+        cases[f"judge_letter/phrase={length}"] = lambda p=phrase, g=guessed, v=letter: (
+            judge_letter_guess(p, g, v)
+        )
+        cases[f"judge_phrase/phrase={length}"] = lambda p=phrase, g=guessed: (
+            judge_phrase_guess(p, g, p)
+        )
+        cases[f"judge_wrong_phrase/phrase={length}"] = lambda p=phrase, g=guessed: (
+            judge_phrase_guess(p, g, "WRONG")
+        )
+
+    for count in TEAM_COUNTS:
+        team_ids: list[int] = list(range(1, count + 1))
+        # The worst case, the starting team is last
+        cases[f"team_ids_order/teams={count}"] = lambda t=team_ids, s=count: rotate_team_ids(t, s)
+    return cases
+
+
+def measure(case: Callable[[], object], min_seconds: float, repeat: int) -> float:
+    timer: timeit.Timer = timeit.Timer(case)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_seconds / 0.2))
+    # The best of several runs is the least disturbed by the rest of the machine
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1_000_000
+
+
+def compare(results: dict[str, float], baseline_path: str, tolerance: float) -> list[str]:
+    with open(baseline_path) as f:
+        baseline: dict[str, float] = json.load(f)["results"]
+    regressions: list[str] = []
+    print(f"\n{'case':<36}{'baseline':>12}{'now':>12}{'ratio':>8}")
+    for name, micros in results.items():
+        if name not in baseline:
+            continue
+        ratio: float = micros / baseline[name]
+        flag: str = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<36}{baseline[name]:>12.3f}{micros:>12.3f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="Per run of a case")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Slowdown allowed")
+    args = parser.parse_args()
+
+    setup_django()
+    results: dict[str, float] = {}
+    print(f"{'case':<36}{'us/call':>12}")
+    for name, case in build_cases(random.Random(args.seed)).items():
+        results[name] = measure(case, args.min_seconds, args.repeat)
+        print(f"{name:<36}{results[name]:>12.3f}")
+
+    if args.output:
+        write_results(args.output, "guess_logic", results)
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
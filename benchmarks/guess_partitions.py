@@ -0,0 +1,142 @@
+"""
+Latency of the hot guess queries on a plain table against one range partitioned by round_id.
+
+Both tables are built with the same rows in a scratch schema of the configured database, with
+the production indexes, and dropped afterwards unless --keep is given. Building 50M rows takes
+a while and several GB of disk, use --rows for a quicker run.
+
+    python -m benchmarks.guess_partitions --rows 50000000 --output guess_partitions.json
+"""
+
+import argparse
+import random
+import time
+from typing import Any
+
+from benchmarks.utils import setup_django, summarize, write_results
+
+SCHEMA: str = "benchmark_guess_partitions"
+COLUMNS: str = """
+    id bigint NOT NULL,
+    type integer NOT NULL,
+    status integer NOT NULL,
+    value varchar(200) NOT NULL,
+    score integer NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    created_by_id integer NOT NULL,
+    round_id bigint NOT NULL,
+    team_id bigint NOT NULL
+"""
+INDEXES: list[str] = ["(round_id, status, type)", "(round_id, id)", "(team_id)"]
+QUERIES: dict[str, str] = {
+    # Correct letter guesses of a round, when judging a guess
+    "judge_letters": (
+        "SELECT value FROM {table} WHERE round_id = %(round_id)s AND status = 1 AND type = 1"
+    ),
+    "list_guesses": (
+        "SELECT * FROM {table} WHERE round_id = %(round_id)s AND id > %(after_id)s "
+        "ORDER BY id LIMIT 1000"
+    ),
+    # The leaderboard of a game, its rounds having consecutive ids
+    "leaderboard": (
+        "SELECT team_id, SUM(score) FROM {table} WHERE round_id = ANY(%(game_round_ids)s) "
+        "GROUP BY team_id ORDER BY team_id"
+    ),
+}
+
+
+def build_tables(cursor: Any, rows: int, guesses_per_round: int, partition_rounds: int) -> int:
+    rounds: int = max(1, rows // guesses_per_round)
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+    cursor.execute(f"CREATE TABLE {SCHEMA}.plain ({COLUMNS}, PRIMARY KEY (id))")
+    cursor.execute(
+        f"CREATE TABLE {SCHEMA}.partitioned ({COLUMNS}, PRIMARY KEY (id, round_id)) "
+        "PARTITION BY RANGE (round_id)"
+    )
+    for lower in range(0, rounds + 1, partition_rounds):
+        cursor.execute(
+            f"CREATE TABLE {SCHEMA}.partitioned_r{lower} PARTITION OF {SCHEMA}.partitioned "
+            f"FOR VALUES FROM ({lower}) TO ({lower + partition_rounds})"
+        )
+
+    start: float = time.perf_counter()
+    cursor.execute(f"""
+        INSERT INTO {SCHEMA}.plain
+        SELECT g, 1 + (g % 3 = 0)::int, 1 + (g % 2)::int, chr(65 + g % 26), g % 5, now(), 1,
+            g / {guesses_per_round}, g % 4
+        FROM generate_series(0, {rows - 1}) g
+        """)
+    cursor.execute(f"INSERT INTO {SCHEMA}.partitioned SELECT * FROM {SCHEMA}.plain")
+    for table in ("plain", "partitioned"):
+        for i, columns in enumerate(INDEXES):
+            cursor.execute(f"CREATE INDEX {table}_{i} ON {SCHEMA}.{table} {columns}")
+        cursor.execute(f"VACUUM ANALYZE {SCHEMA}.{table}")
+    print(f"Built {rows} rows in {rounds} rounds in {time.perf_counter() - start:.0f}s")
+    return rounds
+
+
+def run_queries(cursor: Any, table: str, rounds: int, samples: int, seed: int) -> dict:
+    rng: random.Random = random.Random(seed)
+    results: dict[str, dict] = {}
+    for name, sql in QUERIES.items():
+        query: str = sql.format(table=f"{SCHEMA}.{table}")
+        latencies: list[float] = []
+        for _ in range(samples):
+            round_id: int = rng.randrange(rounds)
+            params: dict = {
+                "round_id": round_id,
+                "after_id": 0,
+                "game_round_ids": list(range(round_id, min(round_id + 10, rounds))),
+            }
+            start: float = time.perf_counter()
+            cursor.execute(query, params)
+            cursor.fetchall()
+            latencies.append((time.perf_counter() - start) * 1000)
+        results[name] = summarize(latencies)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--settings", help="Settings module of the database to use")
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--guesses-per-round", type=int, default=50)
+    parser.add_argument("--partition-rounds", type=int, default=100_000)
+    parser.add_argument("--samples", type=int, default=2000, help="Queries per shape and table")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    setup_django(args.settings)
+    from django.db import connection  # pylint: disable=import-outside-toplevel
+
+    results: dict[str, Any] = {"params": vars(args)}
+    with connection.cursor() as cursor:
+        try:
+            rounds: int = build_tables(
+                cursor, args.rows, args.guesses_per_round, args.partition_rounds
+            )
+            for table in ("plain", "partitioned"):
+                # Once to warm the cache, then measured
+                run_queries(cursor, table, rounds, args.samples, args.seed)
+                results[table] = run_queries(cursor, table, rounds, args.samples, args.seed)
+        finally:
+            if not args.keep:
+                cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+    print(f"{'query':<16}{'table':<14}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for name in QUERIES:
+        for table in ("plain", "partitioned"):
+            stats: dict = results[table][name]
+            print(
+                f"{name:<16}{table:<14}{stats['p50']:>10.3f}{stats['p95']:>10.3f}"
+                f"{stats['p99']:>10.3f}"
+            )
+    if args.output:
+        write_results(args.output, "guess_partitions", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Bytes per row and index sizes of the guess table with its former column types, with the
+compact ones, and with the compact ones reordered to minimise alignment padding.
+
+The tables are built with the same rows in a scratch schema of the configured database, with
+the production indexes, and dropped afterwards unless --keep is given.
+
+    python -m benchmarks.guess_storage --rows 10000000 --output guess_storage.json
+"""
+
+import argparse
+from typing import Any
+
+from benchmarks.utils import setup_django, write_results
+
+SCHEMA: str = "benchmark_guess_storage"
+# Columns in the order of the table, with the types of each layout
+LAYOUTS: dict[str, str] = {
+    "integer": """
+        id bigint NOT NULL, type integer NOT NULL, status integer NOT NULL,
+        value varchar(200) NOT NULL, score integer NOT NULL,
+        created_at timestamp with time zone NOT NULL, created_by_id integer NOT NULL,
+        round_id bigint NOT NULL, team_id bigint NOT NULL
+    """,
+    "smallint": """
+        id bigint NOT NULL, type smallint NOT NULL, status smallint NOT NULL,
+        value varchar(200) NOT NULL, score smallint NOT NULL,
+        created_at timestamp with time zone NOT NULL, created_by_id integer NOT NULL,
+        round_id bigint NOT NULL, team_id bigint NOT NULL
+    """,
+    # Widest alignment first, variable length last
+    "smallint_reordered": """
+        id bigint NOT NULL, created_at timestamp with time zone NOT NULL,
+        round_id bigint NOT NULL, team_id bigint NOT NULL, created_by_id integer NOT NULL,
+        type smallint NOT NULL, status smallint NOT NULL, score smallint NOT NULL,
+        value varchar(200) NOT NULL
+    """,
+}
+INDEXES: dict[str, str] = {
+    "pkey": "(id, round_id)",
+    "round_status_type": "(round_id, status, type)",
+    "round_id": "(round_id, id)",
+    "team_id": "(team_id)",
+}
+# Letter guesses, then one phrase guess every `phrase_every` rows
+ROWS_SQL: str = """
+    SELECT g AS id,
+        CASE WHEN g % {phrase_every} = 0 THEN 2 ELSE 1 END AS type,
+        1 + (g % 2) AS status,
+        CASE WHEN g % {phrase_every} = 0 THEN 'THE QUICK BROWN FOX' ELSE chr(65 + g % 26) END
+            AS value,
+        CASE WHEN g % {phrase_every} = 0 THEN -5 ELSE g % 3 END AS score,
+        now() AS created_at, 1 AS created_by_id, g / 50 AS round_id, g % 4 AS team_id
+    FROM generate_series(1, {rows}) g
+"""
+
+
+def build_table(cursor: Any, layout: str, rows: int, phrase_every: int) -> None:
+    table: str = f"{SCHEMA}.{layout}"
+    cursor.execute(f"CREATE TABLE {table} ({LAYOUTS[layout]})")
+    columns: str = ", ".join(
+        line.split()[0] for line in LAYOUTS[layout].replace(",", "\n").splitlines() if line.strip()
+    )
+    cursor.execute(
+        f"INSERT INTO {table} ({columns}) SELECT {columns} FROM ("
+        f"{ROWS_SQL.format(rows=rows, phrase_every=phrase_every)}) r"
+    )
+    for name, columns in INDEXES.items():
+        cursor.execute(f"CREATE INDEX {layout}_{name} ON {table} {columns}")
+    cursor.execute(f"VACUUM ANALYZE {table}")
+
+
+def measure_table(cursor: Any, layout: str, rows: int) -> dict:
+    table: str = f"{SCHEMA}.{layout}"
+    cursor.execute(f"SELECT avg(pg_column_size(t.*)), pg_relation_size(%s) FROM {table} t", [table])
+    tuple_bytes, table_bytes = cursor.fetchone()
+    results: dict[str, Any] = {
+        # Tuple header and data, without the line pointer and the page overhead
+        "tuple_bytes": float(tuple_bytes),
+        "table_bytes_per_row": table_bytes / rows,
+        "table_mb": table_bytes / 2**20,
+        "indexes_mb": {},
+    }
+    for name in INDEXES:
+        cursor.execute("SELECT pg_relation_size(%s)", [f"{SCHEMA}.{layout}_{name}"])
+        results["indexes_mb"][name] = cursor.fetchone()[0] / 2**20
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--settings", help="Settings module of the database to use")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument(
+        "--phrase-every", type=int, default=10, help="One phrase guess every this many rows"
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    setup_django(args.settings)
+    from django.db import connection  # pylint: disable=import-outside-toplevel
+
+    results: dict[str, Any] = {"params": vars(args)}
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+            for layout in LAYOUTS:
+                build_table(cursor, layout, args.rows, args.phrase_every)
+                results[layout] = measure_table(cursor, layout, args.rows)
+        finally:
+            if not args.keep:
+                cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+    print(f"{'layout':<20}{'tuple B':>10}{'B/row':>10}{'table MB':>10}", end="")
+    print("".join(f"{name:>20}" for name in INDEXES))
+    for layout in LAYOUTS:
+        stats: dict = results[layout]
+        print(
+            f"{layout:<20}{stats['tuple_bytes']:>10.1f}{stats['table_bytes_per_row']:>10.1f}"
+            f"{stats['table_mb']:>10.1f}",
+            end="",
+        )
+        print("".join(f"{stats['indexes_mb'][name]:>20.1f}" for name in INDEXES))
+    if args.output:
+        write_results(args.output, "guess_storage", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Log throughput of the multi-process rotating file handlers, with workers sharing one file.
+
+Small rotation sizes (or a one second rotation interval) make every worker go through many
+rollovers. Size rotation keeps --backup-count files, 30 by default as the logger does. Afterwards
+every line is counted across the rotated files to check none was lost, as long as they didn't
+all fill up.
+
+    python -m benchmarks.log_throughput --workers 8 --records 20000 --handler size
+"""
+
+import argparse
+import glob
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.utils import write_results
+from common.loggingmp import MPRotatingFileHandler, MPTimedRotatingFileHandler
+
+RECORD_PAYLOAD: str = "x" * 120
+
+
+def create_handler(kind: str, filename: str, max_bytes: int, backup_count: int) -> logging.Handler:
+    if kind == "timed":
+        return MPTimedRotatingFileHandler(filename, when="S", backupCount=0)
+    return MPRotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count)
+
+
+def write_records(
+    kind: str, filename: str, max_bytes: int, backup_count: int, records: int, start_at: float
+) -> None:
+    logger: logging.Logger = logging.getLogger(f"benchmark.{os.getpid()}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler: logging.Handler = create_handler(kind, filename, max_bytes, backup_count)
+    handler.setFormatter(logging.Formatter("%(asctime)s|%(process)d|%(message)s"))
+    logger.addHandler(handler)
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+    for i in range(records):
+        logger.info("record=%s|%s", i, RECORD_PAYLOAD)
+    handler.close()
+
+
+def count_lines(filename: str) -> tuple[int, int]:
+    files: list[str] = [f for f in glob.glob(filename + "*") if not f.endswith(".rotating")]
+    lines: int = 0
+    for path in files:
+        with open(path, "rb") as f:
+            lines += sum(1 for _ in f)
+    return lines, len(files)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--records", type=int, default=20000, help="Records per worker")
+    parser.add_argument("--handler", choices=["size", "timed"], default="size")
+    parser.add_argument("--max-bytes", type=int, default=1024 * 1024)
+    parser.add_argument("--backup-count", type=int, default=30, help="Rotated files kept")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    log_dir: str = tempfile.mkdtemp(prefix="log_throughput_")
+    filename: str = os.path.join(log_dir, "info.log")
+    try:
+        start_at: float = time.time() + 0.5
+        workers: list[multiprocessing.Process] = [
+            multiprocessing.Process(
+                target=write_records,
+                args=(
+                    args.handler,
+                    filename,
+                    args.max_bytes,
+                    args.backup_count,
+                    args.records,
+                    start_at,
+                ),
+            )
+            for _ in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed: float = time.time() - start_at
+
+        expected: int = args.workers * args.records
+        written, files = count_lines(filename)
+        results: dict = {
+            "handler": args.handler,
+            "workers": args.workers,
+            "records": expected,
+            "seconds": elapsed,
+            "records_per_second": expected / elapsed,
+            "lines_written": written,
+            "files": files,
+        }
+        print(
+            f"{args.handler}: {args.workers} workers, {expected} records in {elapsed:.2f}s "
+            f"({expected / elapsed:,.0f} records/s), {written} lines in {files} files"
+        )
+        if written != expected and args.handler == "size" and files > args.backup_count:
+            print(
+                f"{expected - written} records rotated out of the {args.backup_count} backups, "
+                "raise --backup-count to check none was lost"
+            )
+        elif written != expected:
+            print(f"LOST {expected - written} records")
+        if args.output:
+            write_results(args.output, "log_throughput", results)
+    finally:
+        shutil.rmtree(log_dir)
+
+
+if __name__ == "__main__":
+    main()
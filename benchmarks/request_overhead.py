@@ -0,0 +1,88 @@
+"""
+Per-request overhead of the default settings against the lean API only profile.
+
+Each profile runs in its own interpreter, as settings can only be loaded once per process.
+Requests go through the full Django handler and middleware chain with the test client,
+against an endpoint that is answered without touching the database.
+
+    python -m benchmarks.request_overhead --requests 5000 --output overhead.json
+"""
+
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import time
+
+from benchmarks.utils import BASE_DIR, setup_django, summarize, write_results
+
+PROFILES: list[str] = ["backend.settings", "backend.settings_api"]
+# Unauthenticated, so it is rejected by the view before any query is made
+DEFAULT_PATH: str = "/api/me/"
+
+
+def run_profile(settings_module: str, path: str, requests: int, warmup: int) -> dict:
+    setup_django(settings_module)
+    # Log I/O is identical for both profiles and would only add noise
+    logging.disable(logging.CRITICAL)
+
+    from django.test import Client  # pylint: disable=import-outside-toplevel
+
+    client: Client = Client()
+    for _ in range(warmup):
+        client.get(path)
+
+    samples: list[float] = []
+    for _ in range(requests):
+        start: float = time.perf_counter()
+        client.get(path)
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return summarize(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--profile", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(run_profile(args.profile, args.path, args.requests, args.warmup)))
+        return
+
+    results: dict[str, dict] = {}
+    for profile in PROFILES:
+        output: bytes = subprocess.check_output(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.request_overhead",
+                "--profile",
+                profile,
+                "--path",
+                args.path,
+                "--requests",
+                str(args.requests),
+                "--warmup",
+                str(args.warmup),
+            ],
+            cwd=BASE_DIR,
+        )
+        results[profile] = json.loads(output.decode().strip().splitlines()[-1])
+
+    print(f"{'profile':<24}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (us/request)")
+    for profile, stats in results.items():
+        print(
+            f"{profile:<24}{stats['mean']:>10.1f}{stats['p50']:>10.1f}"
+            f"{stats['p95']:>10.1f}{stats['p99']:>10.1f}"
+        )
+    if args.output:
+        write_results(args.output, "request_overhead", results)
+
+
+if __name__ == "__main__":
+    main()
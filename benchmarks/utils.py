@@ -0,0 +1,63 @@
+import datetime
+import json
+import os
+import statistics
+import subprocess
+from typing import Optional
+
+BASE_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(settings_module: Optional[str] = None) -> None:
+    if settings_module is not None:
+        os.environ["DJANGO_SETTINGS_MODULE"] = settings_module
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    import django  # pylint: disable=import-outside-toplevel
+
+    django.setup()
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    ordered: list[float] = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1],
+    }
+
+
+def percentile(ordered_samples: list[float], pct: float) -> float:
+    if not ordered_samples:
+        return 0.0
+    index: int = min(len(ordered_samples) - 1, int(len(ordered_samples) * pct / 100))
+    return ordered_samples[index]
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: str, benchmark: str, results: dict) -> None:
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "benchmark": benchmark,
+                "revision": git_revision(),
+                "created_at": datetime.datetime.utcnow().isoformat(),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
@@ -33,7 +33,9 @@ class CorrelationMiddleware:
 
 class CorrelationLogFilter(logging.Filter):
     def filter(self, record) -> bool:
-        record.correlation_id = correlation_local.correlation_id
+        # Queued records were already tagged on the thread that logged them
+        if not hasattr(record, "correlation_id"):
+            record.correlation_id = correlation_local.correlation_id
         return True
 
 
@@ -0,0 +1,262 @@
+"""
+Routes queries to the shard holding their game, and the reads of GET requests to the replicas.
+
+Shards
+  Games are spread over the GAME_SHARDS databases, "default" first, then the ones set up from
+  DB_SHARDS. A game and its phrases, teams, rounds and guesses live on the same shard. Each
+  shard hands out ids in its own range, [index << SHARD_ID_BITS, (index + 1) << SHARD_ID_BITS),
+  so the shard of any row follows from its id, without a directory to query, and ids stay
+  unique across shards. With up to 32 shards, ids stay below 2**53 for JavaScript clients. The games created before sharding keep their ids on "default".
+
+  A request about a game sets its shard, see `GameShardViewMixin`, and the queries of the
+  backend app go there. Transactions and on-commit hooks have to name the database too,
+  through `shard_atomic` and `shard_on_commit`. Other apps, users among them, stay on
+  "default".
+
+Replicas
+  Replicas of "default" are set up from DB_REPLICA_HOSTS. A GET or HEAD request sticks to one
+  replica, picked at random, so its queries see a single snapshot of the data. Reads go to
+  the primary when:
+
+  - the request isn't a GET or HEAD, so handlers reading before they write see their writes
+  - a transaction is open on the primary, e.g. in an @atomic handler
+  - the user wrote less than READ_YOUR_WRITES_SECONDS ago, so that one who just posted a guess
+    lists it even if the replicas lag. Write requests of authenticated users are noted in the
+    READ_YOUR_WRITES_CACHE, shared by every process, and checked once a read request is
+    authenticated, see `read_own_writes`
+  - the code runs in `use_primary()`
+"""
+
+import functools
+import heapq
+import itertools
+import random
+from contextlib import contextmanager
+from operator import attrgetter
+from threading import local
+from typing import Any, Callable, Iterator, Optional, Union
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import QuerySet
+from django.http import HttpRequest
+
+READ_METHODS: tuple[str, ...] = ("GET", "HEAD")
+# Rows of a shard have ids in [index << SHARD_ID_BITS, (index + 1) << SHARD_ID_BITS)
+SHARD_ID_BITS: int = 48
+# The app of the sharded models
+GAME_APP_LABEL: str = "backend"
+
+
+class RoutingLocal(local):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)  # type: ignore
+        self.shard: Optional[str] = None
+        self.replica: Optional[str] = None
+        self.primary_forced: int = 0
+
+
+class DatabaseRouter:
+    def db_for_read(self, model, **hints) -> str:
+        if model._meta.app_label == GAME_APP_LABEL:
+            shard: str = _get_model_shard(hints)
+            if shard != DEFAULT_DB_ALIAS:
+                return shard
+
+        replica: Optional[str] = routing_local.replica
+        if replica is None or routing_local.primary_forced:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints) -> str:
+        if model._meta.app_label == GAME_APP_LABEL:
+            return _get_model_shard(hints)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # Replicas hold the same rows as the primary, and a game's rows share its shard
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, model_name=None, **hints) -> bool:
+        if app_label == GAME_APP_LABEL:
+            return db in settings.GAME_SHARDS
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response: Callable = get_response
+        self.replicas: list[str] = get_replica_aliases()
+
+    def __call__(self, request: HttpRequest) -> Any:
+        is_read: bool = request.method in READ_METHODS
+        if is_read and self.replicas:
+            routing_local.replica = random.choice(self.replicas)
+        try:
+            response: Any = self.get_response(request)
+        finally:
+            routing_local.replica = None
+
+        if not is_read and self.replicas and settings.READ_YOUR_WRITES_SECONDS > 0:
+            # Set by the authentication of DRF views too
+            user: Any = getattr(request, "user", None)
+            if user is not None and user.is_authenticated:
+                caches[settings.READ_YOUR_WRITES_CACHE].set(
+                    _get_recent_write_key(user.id), True, settings.READ_YOUR_WRITES_SECONDS
+                )
+        return response
+
+
+def shard_atomic(func: Optional[Callable] = None) -> Any:
+    """
+    `transaction.atomic` on the shard of the current game, as `@shard_atomic` or
+    `with shard_atomic():`. Decorated functions look the shard up on every call.
+    """
+    if func is None:
+        return transaction.atomic(using=get_current_shard())
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) -> Any:
+        with transaction.atomic(using=get_current_shard()):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def shard_on_commit(func: Callable[[], Any]) -> None:
+    """`transaction.on_commit` for the transaction on the shard of the current game."""
+    transaction.on_commit(func, using=get_current_shard())
+
+
+class AllShardsList:
+    """
+    The rows of a queryset on every shard, merged in its order, for paginating them. Shards are
+    queried one after the other, each for as many rows as the requested slice ends at.
+    """
+
+    ordered: bool = True
+
+    def __init__(self, queryset: QuerySet) -> None:
+        order_by: tuple[str, ...] = queryset.query.order_by
+        if not order_by or len({field.startswith("-") for field in order_by}) != 1:
+            raise ValueError("Rows of several shards can only be merged on fields in one direction")
+        self.querysets: list[QuerySet] = [
+            # The default database may be read from a replica
+            queryset if shard == DEFAULT_DB_ALIAS else queryset.using(shard)
+            for shard in settings.GAME_SHARDS
+        ]
+        self.reverse: bool = order_by[0].startswith("-")
+        self.key: Callable[[Any], Any] = attrgetter(*(field.lstrip("-") for field in order_by))
+
+    def count(self) -> int:
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, int):
+            return self[index : index + 1][0]
+        start: int = index.start or 0
+        rows: Iterator = heapq.merge(
+            *(queryset[: index.stop] for queryset in self.querysets),
+            key=self.key,
+            reverse=self.reverse,
+        )
+        return list(itertools.islice(rows, start, index.stop))
+
+
+@contextmanager
+def read_snapshot(model: type) -> Iterator[None]:
+    """
+    Runs the block in a read only REPEATABLE READ transaction on the database the reads of
+    the model go to, so that its queries all see the same snapshot of the data. Within an
+    enclosing transaction the block runs in that one instead.
+    """
+    using: str = router.db_for_read(model)
+    is_outermost: bool = not connections[using].in_atomic_block
+    with transaction.atomic(using=using):
+        if is_outermost:
+            with connections[using].cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        yield
+
+
+@contextmanager
+def use_game_shard(shard: str) -> Iterator[None]:
+    """Sends the queries of the game models within the block to the shard."""
+    previous_shard: Optional[str] = routing_local.shard
+    routing_local.shard = shard
+    try:
+        yield
+    finally:
+        routing_local.shard = previous_shard
+
+
+def get_current_shard() -> str:
+    return routing_local.shard or DEFAULT_DB_ALIAS
+
+
+def get_game_shard(game_id: int) -> Optional[str]:
+    """The shard holding the game, None if its id belongs to no configured shard."""
+    index: int = game_id >> SHARD_ID_BITS
+    shards: list[str] = settings.GAME_SHARDS
+    return shards[index] if 0 <= index < len(shards) else None
+
+
+def choose_new_game_shard() -> str:
+    return random.choice(settings.GAME_SHARDS)
+
+
+@contextmanager
+def use_primary() -> Iterator[None]:
+    """Reads from the primary within the block, for data that must be up to date."""
+    routing_local.primary_forced += 1
+    try:
+        yield
+    finally:
+        routing_local.primary_forced -= 1
+
+
+def read_own_writes(user_id: int) -> None:
+    """
+    Sends the reads of the rest of the request to the primary if the user wrote recently. Called
+    once the request is authenticated.
+    """
+    if routing_local.replica is None or settings.READ_YOUR_WRITES_SECONDS <= 0:
+        return
+    # Written on the primary, not yet on the replicas maybe
+    with use_primary():
+        wrote_recently: bool = caches[settings.READ_YOUR_WRITES_CACHE].get(
+            _get_recent_write_key(user_id), False
+        )
+    if wrote_recently:
+        routing_local.replica = None
+
+
+def get_replica_aliases() -> list[str]:
+    return settings.DATABASE_REPLICAS
+
+
+def close_connections() -> None:
+    """Closes the connections of the current thread to the primary and the replicas."""
+    for alias in settings.DATABASES:
+        connections[alias].close()
+
+
+def _get_model_shard(hints: dict) -> str:
+    # Objects fetched from a shard keep querying it, e.g. through their relations
+    instance: Any = hints.get("instance")
+    if instance is not None and instance._state.db is not None:
+        return instance._state.db
+    return get_current_shard()
+
+
+def _get_recent_write_key(user_id: int) -> str:
+    return f"recent_write:{user_id}"
+
+
+routing_local: RoutingLocal = RoutingLocal()
@@ -16,6 +16,13 @@ rollover_when: rollover interval. default 'MIDNIGHT'
 rollover_backup_count: how many backup log files are kept. default 30
 	if rollover_backup_count = 0, all log files are kept.
 	if rollover_backup_count > 0, when rollover is done, no more than rollover_backup_count files are kept - the oldest ones are deleted.
+log_format: 'text' for the pipe delimited lines, 'json' for one JSON object per line. default 'text'
+sampling: fraction of the records to keep per logger and level. default no sampling
+	e.g. {'main.exception_handler': {'INFO': 0.01}} keeps 1% of the handled errors logged at info level.
+queue_handlers: hand records over to a single listener thread per process which formats and writes them. default True
+queue_size: how many records can wait for the listener thread. default 10000
+queue_block_timeout: when the queue is full, how many seconds to wait for room before dropping the record. default None
+	if queue_block_timeout is None, records are dropped right away when the queue is full.
 
 [Normal Python Program]
 # config.py
@@ -100,6 +107,11 @@ def init_logger(
     sentry_project_release=None,
     rollover_when="MIDNIGHT",
     rollover_backup_count=30,
+    log_format="text",
+    sampling=None,
+    queue_handlers=True,
+    queue_size=10000,
+    queue_block_timeout=None,
 ):
     # pylint: disable=too-many-locals
 
@@ -222,6 +234,24 @@ def init_logger(
         },
     }
 
+    if log_format == "json":
+        for formatter_name in ("standard", "short", "data"):
+            logger_config["formatters"][formatter_name] = {
+                "()": "common.loggingformat.JsonFormatter",
+                "datefmt": "%Y-%m-%d %H:%M:%S",
+            }
+
+    for logger_name, rates in (sampling or {}).items():
+        filter_name = "sampling_%s" % logger_name
+        logger_config["filters"][filter_name] = {
+            "()": "common.loggingformat.SamplingFilter",
+            "rates": rates,
+        }
+        sampled_logger = logger_config["loggers"].setdefault(
+            logger_name, {"handlers": [], "level": "DEBUG", "propagate": True}
+        )
+        sampled_logger.setdefault("filters", []).append(filter_name)
+
     is_django_app = False
     is_debug = False
     is_test = False
@@ -335,6 +365,15 @@ def init_logger(
 
         loggerconfig.dictConfig(logger_config)
 
+    if queue_handlers:
+        from common import loggingqueue
+
+        loggingqueue.attach_queue_listener(
+            [logging.getLogger(name) for name in logger_config["loggers"]],
+            queue_size=queue_size,
+            block_timeout=queue_block_timeout,
+        )
+
     if recover_path:
         sys.path.remove(work_dir)
 
@@ -377,6 +416,15 @@ def try_init_logger():
                 pass
 
 
+def shutdown_logger():
+    """Flushes the records still waiting for the listener thread"""
+    import sys
+
+    loggingqueue = sys.modules.get("common.loggingqueue")
+    if loggingqueue is not None:
+        loggingqueue.stop_queue_listener()
+
+
 class MockLog:
     def info(self, *to_log, **kwargs):
         ...
@@ -390,6 +438,40 @@ class MockLog:
     def exception(self, *to_log, **kwargs):
         print(to_log)
 
+    def data(self, *to_log, **kwargs):
+        ...
+
+    def console(self, *to_log, **kwargs):
+        ...
+
+    def getChild(self, suffix):
+        return self
+
+
+class LazyLog:
+    """
+    Stands in for `log` until it is first used, so that importing this module doesn't
+    build the logging configuration and open the log files, e.g. at worker boot.
+    """
+
+    def __init__(self):
+        import threading
+
+        self._init_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if log is self:
+            self._init()
+        return getattr(log, name)
+
+    def _init(self):
+        global log  # pylint: disable=global-statement
+        with self._init_lock:
+            if log is self:
+                try_init_logger()
+            if log is self:
+                log = MockLog()
+
 
 if log is None:
-    try_init_logger()
+    log = LazyLog()
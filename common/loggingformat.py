@@ -0,0 +1,50 @@
+# type: ignore
+import json
+import logging
+import random
+
+# Attributes every LogRecord has, anything else on a record was passed through `extra`
+_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line, including whatever was passed as `extra`"""
+
+    def format(self, record):
+        entry = {
+            "time": "%s.%03d" % (self.formatTime(record, self.datefmt), record.msecs),
+            "level": record.levelname,
+            "logger": record.name,
+            "correlation_id": getattr(record, "correlation_id", None),
+            "process": record.process,
+            "thread": record.thread,
+            "location": "%s:%d" % (record.filename, record.lineno),
+            "function": "%s.%s" % (record.module, record.funcName),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of the records of each configured level, e.g. {"INFO": 0.01}.
+    Add it to a logger rather than a handler, so a sampled out record is dropped before any
+    handler renders its arguments.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {logging._checkLevel(level): rate for level, rate in rates.items()}
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno)
+        if rate is None or rate >= 1:
+            return True
+        return random.random() < rate
@@ -1,148 +1,154 @@
 # pylint: disable=wildcard-import, invalid-name, useless-object-inheritance, self-assigning-variable
 # type: ignore
+"""
+Rotating file handlers shared by several processes without any cross-process lock.
+
+Every process appends to the same file opened with O_APPEND. At rollover, one process wins
+the rotation through an atomic `os.link` to a name only one of them can create, and the
+others find that name taken and carry on. Each process notices that the file it writes to
+was rotated away by comparing its inode with the one at the path, at most once per
+`reopen_check_interval` seconds, and then reopens it.
+"""
+
 import os
 import time
 
 # pylint: skip-file
-import platform
 from logging.handlers import *
 
-from common import ipc
-
-if platform.system().lower() == "windows":
-
-    class _IncrementalLock(ipc.Lock):
-        def try_lock(self, value):
-            self.acquire()
-            return True
-
-        def release_lock(self, value):
-            self.release()
+STALE_ROTATION_SECONDS = 60
 
 
-else:
+class _ReopenOnRotationMixin(object):
+    reopen_check_interval = 1.0
 
-    class _IncrementalLock:
-        def __init__(self, name):
-            self.name = name
-            self.lock = None
+    def _open(self):
+        stream = super(_ReopenOnRotationMixin, self)._open()
+        stat = os.fstat(stream.fileno())
+        self._stream_id = (stat.st_dev, stat.st_ino)
+        self._next_reopen_check = time.monotonic() + self.reopen_check_interval
+        return stream
 
-        def try_lock(self, value):
-            if self.lock is not None:
-                return False
-            self.lock = ipc.Lock(self.name)
-            self.lock.acquire()
-            old_value = self.lock.handle.read()
-            if value <= old_value:
-                self.lock.release()
-                self.lock = None
-                return False
-            return True
+    def emit(self, record):
+        self._reopen_if_rotated()
+        super(_ReopenOnRotationMixin, self).emit(record)
 
-        def release_lock(self, value):
-            if self.lock is None:
-                return
-            with open(self.lock.filename, "w") as f:
-                f.write(value)
-            self.lock.release()
-            self.lock = None
+    def _reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        now = time.monotonic()
+        if now < self._next_reopen_check:
+            return
+        self._next_reopen_check = now + self.reopen_check_interval
+        try:
+            stat = os.stat(self.baseFilename)
+            current_id = (stat.st_dev, stat.st_ino)
+        except FileNotFoundError:
+            current_id = None
+        if current_id != self._stream_id:
+            self.stream.close()
+            self.stream = self._open()
 
 
-class MPRotatingFileHandler(RotatingFileHandler, object):
+class MPRotatingFileHandler(_ReopenOnRotationMixin, RotatingFileHandler):
     def __init__(self, filename, mode="a", maxBytes=0, backupCount=0, encoding=None, delay=0):
-        self.mplock_name = filename.replace("/", "_").replace("\\", "_")
         super(MPRotatingFileHandler, self).__init__(
             filename, mode, maxBytes, backupCount, encoding, delay
         )
 
+    def shouldRollover(self, record):
+        if self.maxBytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        # With O_APPEND the end of the stream is the end of the file, whoever wrote it
+        self.stream.seek(0, 2)
+        return self.stream.tell() >= self.maxBytes
+
     def doRollover(self):
-        mplock = ipc.Lock(self.mplock_name)
-        mplock.acquire()
-        if not self.prepareRollover():
-            mplock.release()
-            return
         if self.stream:
             self.stream.close()
             self.stream = None
         if self.backupCount > 0:
-            for i in range(self.backupCount - 1, 0, -1):
-                sfn = "%s.%d" % (self.baseFilename, i)
-                dfn = "%s.%d" % (self.baseFilename, i + 1)
-                if os.path.exists(sfn):
-                    if os.path.exists(dfn):
-                        os.remove(dfn)
-                    os.rename(sfn, dfn)
-            dfn = self.baseFilename + ".1"
-            if os.path.exists(dfn):
-                os.remove(dfn)
-            os.rename(self.baseFilename, dfn)
-        mplock.release()
+            self._rotate()
         self.stream = self._open()
 
-    def prepareRollover(self):
-        if self.stream is not None:
-            self.flush()
-            self.stream.close()
-            self.stream = None
-        self.stream = self._open()
-        if self.maxBytes > 0:
-            self.stream.seek(0, 2)
-            if self.stream.tell() >= float(self.maxBytes) * 0.99:
-                return True
-        return False
+    def _rotate(self):
+        try:
+            if os.stat(self.baseFilename).st_size < self.maxBytes:
+                # Another process rotated it already, we were still writing to the old file
+                return
+        except FileNotFoundError:
+            return
+
+        rotating_filename = self.baseFilename + ".rotating"
+        try:
+            os.link(self.baseFilename, rotating_filename)
+        except FileExistsError:
+            self._discard_if_stale(rotating_filename)
+            return
+        except FileNotFoundError:
+            return
+
+        # The link may have resolved the path before a rotation that finished meanwhile, and
+        # then linked the file already rotated to .1. Only go on with the file still in place.
+        if not self._is_current(rotating_filename):
+            os.unlink(rotating_filename)
+            return
+
+        # Only one process gets here, the others reopen the path once they see it changed
+        os.unlink(self.baseFilename)
+        for i in range(self.backupCount - 1, 0, -1):
+            sfn = self.rotation_filename("%s.%d" % (self.baseFilename, i))
+            dfn = self.rotation_filename("%s.%d" % (self.baseFilename, i + 1))
+            if os.path.exists(sfn):
+                os.replace(sfn, dfn)
+        os.replace(rotating_filename, self.rotation_filename(self.baseFilename + ".1"))
+
+    def _is_current(self, rotating_filename):
+        try:
+            stat = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return False
+        rotating_stat = os.stat(rotating_filename)
+        return (stat.st_dev, stat.st_ino) == (rotating_stat.st_dev, rotating_stat.st_ino) and (
+            stat.st_size >= self.maxBytes
+        )
 
+    def _discard_if_stale(self, rotating_filename):
+        # Left behind by a process that died in the middle of a rotation
+        try:
+            if time.time() - os.stat(rotating_filename).st_mtime > STALE_ROTATION_SECONDS:
+                os.unlink(rotating_filename)
+        except FileNotFoundError:
+            pass
 
-class MPTimedRotatingFileHandler(TimedRotatingFileHandler, object):
+
+class MPTimedRotatingFileHandler(_ReopenOnRotationMixin, TimedRotatingFileHandler):
     def __init__(
         self, filename, when="h", interval=1, backupCount=0, encoding=None, delay=False, utc=False
     ):
-        self.mplock_name = filename.replace("/", "_").replace("\\", "_")
         super(MPTimedRotatingFileHandler, self).__init__(
             filename, when, interval, backupCount, encoding, delay, utc
         )
 
     def computeRollover(self, currentTime):
+        # Align to interval boundaries, so that every process rolls over at the same time,
+        # into the same file name
         result = int(super(MPTimedRotatingFileHandler, self).computeRollover(currentTime))
         if self.when == "S":
             result = result
         elif self.when == "M":
-            result = result / 60 * 60
+            result = result // 60 * 60
         elif self.when == "H":
-            result = result / 3600 * 3600
+            result = result // 3600 * 3600
         return result
 
     def doRollover(self):
         if self.stream:
             self.stream.close()
             self.stream = None
-        t = self.rolloverAt - self.interval
-        if self.utc:
-            timeTuple = time.gmtime(t)
-        else:
-            timeTuple = time.localtime(t)
-        formattedTime = time.strftime(self.suffix, timeTuple)
-        mplock = _IncrementalLock(self.mplock_name)
-        if mplock.try_lock(formattedTime):
-            dfn = self.baseFilename + "." + formattedTime
-            if os.path.exists(self.baseFilename) and not os.path.exists(dfn):
-                try:
-                    os.rename(self.baseFilename, dfn)
-                except OSError:
-                    if os.name == "nt":
-                        import shutil
-
-                        shutil.copy(self.baseFilename, dfn)
-                        base_file_obj = open(self.baseFilename, "w")
-                        base_file_obj.truncate()
-                        base_file_obj.close()
-                    else:
-                        raise
-                if self.backupCount > 0:
-                    for s in self.getFilesToDelete():
-                        os.remove(s)
-            mplock.release_lock(formattedTime)
 
-        self.stream = self._open()
         currentTime = int(time.time())
         newRolloverAt = self.computeRollover(currentTime)
         while newRolloverAt <= currentTime:
@@ -155,4 +161,34 @@ class MPTimedRotatingFileHandler(TimedRotatingFileHandler, object):
                     newRolloverAt -= 3600
                 else:  # DST bows out before next rollover, so we need to add an hour
                     newRolloverAt += 3600
+
+        # The file holds the period before the one that has just started. Deriving it from
+        # the current time rather than self.rolloverAt keeps an idle process from rotating
+        # the current file into a stale name.
+        t = newRolloverAt - 2 * self.interval
+        if self.utc:
+            timeTuple = time.gmtime(t)
+        else:
+            timeTuple = time.localtime(t)
+        dfn = self.rotation_filename(
+            self.baseFilename + "." + time.strftime(self.suffix, timeTuple)
+        )
+        if self._rotate(dfn) and self.backupCount > 0:
+            for s in self.getFilesToDelete():
+                try:
+                    os.remove(s)
+                except FileNotFoundError:
+                    pass
+
+        self.stream = self._open()
         self.rolloverAt = newRolloverAt
+
+    def _rotate(self, dfn):
+        try:
+            os.link(self.baseFilename, dfn)
+        except (FileExistsError, FileNotFoundError):
+            # Already rotated by another process, or nothing was written in the period
+            return False
+        # Only one process gets here, the others reopen the path once they see it changed
+        os.unlink(self.baseFilename)
+        return True
@@ -0,0 +1,145 @@
+# pylint: disable=invalid-name
+# type: ignore
+import atexit
+import logging
+import os
+import queue
+from collections.abc import Mapping
+from logging.handlers import QueueHandler, QueueListener
+
+from common.correlations import CorrelationLogFilter
+
+DEFAULT_QUEUE_SIZE = 10000
+# Arguments of these types can't change once logged, so formatting them later is safe
+SCALAR_ARG_TYPES = (str, bytes, int, float, type(None))
+
+
+class DispatchingQueueListener(QueueListener):
+    """
+    The single thread of a process that formats and writes log records.
+    Records are queued together with the name of the logger they were handed to, and are
+    dispatched to the handlers that logger had before being attached to the queue.
+    """
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize=queue_size), respect_handler_level=True)
+        self.queue_size = queue_size
+        self.handlers_by_logger = {}
+
+    def handle(self, item):
+        logger_name, record = item
+        for handler in self.handlers_by_logger.get(logger_name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def attach(self, logger, block_timeout=None):
+        if not logger.handlers:
+            return
+        self.handlers_by_logger[logger.name] = list(logger.handlers)
+        queue_handler = BoundedQueueHandler(self, logger.name, block_timeout)
+        logger.handlers = [queue_handler]
+
+    def enqueue_sentinel(self):
+        # The queue may be full, wait for the listener to make room rather than failing
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        # Processes whatever is still queued before returning
+        if self._thread is not None:
+            super().stop()
+
+    def _restart_in_child(self):
+        # Neither the thread nor the queue locks survive a fork, start over with fresh ones
+        if self._thread is None:
+            return
+        self._thread = None
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.start()
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Hands records over to the listener thread, leaving formatting and I/O to it.
+    When the queue is full, the record is dropped, or with `block_timeout` the caller waits
+    at most that long for room first. The number of dropped records is logged once the queue
+    accepts records again.
+    """
+
+    def __init__(self, listener, logger_name, block_timeout=None):
+        super().__init__(listener.queue)
+        self.listener = listener
+        self.logger_name = logger_name
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        # Thread local values must be read on the logging thread, not on the listener's
+        self.addFilter(CorrelationLogFilter())
+
+    def prepare(self, record):
+        # The listener formats the message later, freeze mutable arguments as they are now
+        args = record.args
+        if isinstance(args, Mapping):
+            args = args.values()
+        if args and not all(isinstance(arg, SCALAR_ARG_TYPES) for arg in args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self._put(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            try:
+                self._put(self._make_dropped_record(record, dropped))
+            except queue.Full:
+                self.dropped += dropped
+
+    def _put(self, record):
+        if self.block_timeout is None:
+            self.listener.queue.put_nowait((self.logger_name, record))
+        else:
+            self.listener.queue.put((self.logger_name, record), timeout=self.block_timeout)
+
+    def _make_dropped_record(self, record, dropped):
+        return logging.makeLogRecord(
+            {
+                "name": record.name,
+                "levelno": logging.WARNING,
+                "levelname": logging.getLevelName(logging.WARNING),
+                "msg": "log_queue|dropped %s records, the queue was full",
+                "args": (dropped,),
+                "correlation_id": None,
+            }
+        )
+
+
+_listener = None
+
+
+def attach_queue_listener(loggers, queue_size=DEFAULT_QUEUE_SIZE, block_timeout=None):
+    global _listener  # pylint: disable=global-statement
+    stop_queue_listener()
+    _listener = DispatchingQueueListener(queue_size)
+    for logger in loggers:
+        _listener.attach(logger, block_timeout)
+    _listener.start()
+    return _listener
+
+
+def stop_queue_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_queue_listener_in_child():
+    if _listener is not None:
+        _listener._restart_in_child()  # pylint: disable=protected-access
+
+
+# Registered after logging's own shutdown hook, so it runs first and the handlers get flushed
+atexit.register(stop_queue_listener)
+# Registered once for whichever listener is current, rather than once per listener created
+os.register_at_fork(after_in_child=_restart_queue_listener_in_child)
@@ -0,0 +1,113 @@
+"""
+Prometheus metrics of the API.
+
+Under gunicorn, PROMETHEUS_MULTIPROC_DIR makes every worker keep its metrics in mmap-backed
+files in that directory, and the /metrics endpoint aggregates the files of all workers. The
+endpoint wants METRICS_TOKEN as a bearer token, or a local client when no token is set.
+"""
+
+import hmac
+import os
+from typing import Any, Callable
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseNotFound
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from common.timings import RequestTimings, request_timing_local
+
+MULTIPROCESS_DIR_ENV: str = "PROMETHEUS_MULTIPROC_DIR"
+UNMATCHED_ROUTE: str = "<unmatched>"
+LOCAL_ADDRESSES: tuple[str, ...] = ("127.0.0.1", "::1")
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency per URL pattern",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests being handled",
+    multiprocess_mode="livesum",
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries per request and URL pattern",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups", ["cache", "result"])
+GUESSES = Counter("guesses_total", "Committed guesses", ["type", "status"])
+ROUNDS_CREATED = Counter("rounds_created_total", "Committed round creations")
+ROUNDS_ENDED = Counter("rounds_ended_total", "Rounds ended by a guess")
+
+
+def record_cache_lookup(cache: str, is_hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if is_hit else "miss").inc()
+
+
+def record_guess(guess_type: str, status: str) -> None:
+    GUESSES.labels(type=guess_type, status=status).inc()
+
+
+def record_round_created() -> None:
+    ROUNDS_CREATED.inc()
+
+
+def record_round_ended() -> None:
+    ROUNDS_ENDED.inc()
+
+
+class MetricsMiddleware:
+    """
+    Observes the latency and query count of every request per URL pattern.
+    Place it after RequestTimingMiddleware, whose query count it reads.
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response: Callable = get_response
+
+    def __call__(self, request: HttpRequest) -> Any:
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            response: Any = self.get_response(request)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+
+        timings: RequestTimings = request_timing_local.timings
+        route: str = UNMATCHED_ROUTE
+        if request.resolver_match is not None:
+            route = request.resolver_match.route
+        if timings is not None:
+            REQUEST_LATENCY.labels(
+                method=request.method, route=route, status=response.status_code
+            ).observe(timings.elapsed())
+            REQUEST_DB_QUERIES.labels(route=route).observe(timings.query_count)
+        return response
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    # Not found rather than unauthorized, the endpoint isn't part of the API
+    if not _is_metrics_scraper(request):
+        return HttpResponseNotFound()
+    registry: CollectorRegistry = REGISTRY
+    if MULTIPROCESS_DIR_ENV in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def _is_metrics_scraper(request: HttpRequest) -> bool:
+    if not settings.METRICS_TOKEN:
+        return request.META.get("REMOTE_ADDR") in LOCAL_ADDRESSES
+    authorization: str = request.META.get("HTTP_AUTHORIZATION", "")
+    return hmac.compare_digest(authorization.encode(), f"Bearer {settings.METRICS_TOKEN}".encode())
@@ -0,0 +1,76 @@
+"""
+Profiles a single request on demand, for a staff user sending an `X-Profile` header.
+
+    X-Profile: file        writes the profile to PROFILE_DIR, named in the X-Profile-File header
+    X-Profile: attachment  returns the profile instead of the response
+
+Profiles are cProfile stats, to read with `python -m pstats` or snakeviz. Requests without the
+header only pay for a dict lookup. Under the gevent worker the profiler sees every greenlet
+scheduled while the request waits on I/O, so profile on a worker that isn't busy.
+"""
+
+import cProfile
+import marshal
+import os
+import re
+import time
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from rest_framework.exceptions import APIException
+
+from common.logger import log
+from common.rest.jwt import JWTTokenUserAuthentication
+
+PROFILE_HEADER: str = "HTTP_X_PROFILE"
+PROFILE_TO_FILE: str = "file"
+PROFILE_AS_ATTACHMENT: str = "attachment"
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response: Callable = get_response
+
+    def __call__(self, request: HttpRequest) -> Any:
+        profile_mode: Optional[str] = request.META.get(PROFILE_HEADER)
+        if profile_mode is None:
+            return self.get_response(request)
+        if profile_mode not in (PROFILE_TO_FILE, PROFILE_AS_ATTACHMENT):
+            return self.get_response(request)
+        if not _is_staff_request(request):
+            return self.get_response(request)
+
+        profile: cProfile.Profile = cProfile.Profile()
+        response: Any = profile.runcall(self.get_response, request)
+        profile.create_stats()
+        filename: str = _profile_filename(request)
+        log.info("profile_request|path=%s|mode=%s|file=%s", request.path, profile_mode, filename)
+
+        if profile_mode == PROFILE_AS_ATTACHMENT:
+            attachment: HttpResponse = HttpResponse(
+                marshal.dumps(profile.stats), content_type="application/octet-stream"
+            )
+            attachment["Content-Disposition"] = f'attachment; filename="{filename}"'
+            return attachment
+
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        profile.dump_stats(os.path.join(settings.PROFILE_DIR, filename))
+        response["X-Profile-File"] = filename
+        return response
+
+
+def _is_staff_request(request: HttpRequest) -> bool:
+    try:
+        authenticated: Optional[tuple] = JWTTokenUserAuthentication().authenticate(request)
+    except APIException:
+        return False
+    if authenticated is None:
+        return False
+    user: Any = authenticated[0]
+    return bool(user.is_active and user.is_staff)
+
+
+def _profile_filename(request: HttpRequest) -> str:
+    path: str = re.sub(r"[^A-Za-z0-9]+", "_", request.path).strip("_")
+    return f"{int(time.time() * 1000)}-{os.getpid()}-{request.method}-{path}.prof"
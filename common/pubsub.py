@@ -0,0 +1,168 @@
+import json
+import os
+import queue
+import select
+import threading
+import time
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from common.logger import log
+
+PG_NOTIFY_CHANNEL: str = "event_hub"
+DEFAULT_MAX_PENDING_EVENTS: int = 1000
+
+
+class Subscription:
+    def __init__(self, broker: "Broker", channel: str, max_pending: int) -> None:
+        self.broker: Broker = broker
+        self.channel: str = channel
+        self.events: queue.Queue = queue.Queue(maxsize=max_pending)
+        self.is_closed: bool = False
+
+    def get(self, timeout: float) -> Optional[dict]:
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class Broker:
+    """
+    In-process fan-out of events to every subscriber of a channel.
+    A subscriber that falls too far behind is closed instead of blocking the publisher.
+    """
+
+    def __init__(self, max_pending: int = DEFAULT_MAX_PENDING_EVENTS) -> None:
+        self.max_pending: int = max_pending
+        self._lock: threading.Lock = threading.Lock()
+        self._subscriptions: dict[str, set[Subscription]] = {}
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription: Subscription = Subscription(self, channel, self.max_pending)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.is_closed = True
+        with self._lock:
+            subscriptions: Optional[set[Subscription]] = self._subscriptions.get(
+                subscription.channel
+            )
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.channel]
+
+    def publish(self, channel: str, event: dict) -> None:
+        with self._lock:
+            subscriptions: list[Subscription] = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.events.put_nowait(event)
+            except queue.Full:
+                log.warning("broker_publish|dropping slow subscriber|channel=%s", channel)
+                self.unsubscribe(subscription)
+
+    def subscriber_count(self, channel: str) -> int:
+        with self._lock:
+            return len(self._subscriptions.get(channel, ()))
+
+
+class PostgresNotifyBridge:
+    """
+    Relays events between workers through Postgres LISTEN/NOTIFY.
+    NOTIFY is transactional, so an event is only delivered once the publishing
+    transaction commits, and it reaches the listener of every worker, including our own.
+    """
+
+    def __init__(self, broker: Broker, pg_channel: str = PG_NOTIFY_CHANNEL) -> None:
+        self.broker: Broker = broker
+        self.pg_channel: str = pg_channel
+        self._lock: threading.Lock = threading.Lock()
+        self._listener_pid: Optional[int] = None
+
+    def publish(self, channel: str, event: dict, using: str = DEFAULT_DB_ALIAS) -> None:
+        payload: str = json.dumps({"channel": channel, "event": event})
+        with connections[using].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.pg_channel, payload])
+
+    def ensure_listening(self) -> None:
+        # The listener thread does not survive a fork, so it is tracked per process
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            thread: threading.Thread = threading.Thread(
+                target=self._listen_forever, name="pg-notify-listener", daemon=True
+            )
+            thread.start()
+            self._listener_pid = os.getpid()
+
+    def _listen_forever(self) -> None:
+        while True:
+            try:
+                self._listen()
+            except Exception as e:  # pylint: disable=broad-except
+                log.exception("pg_notify_listen|error=%s", e)
+                time.sleep(1)
+
+    def _listen(self) -> None:
+        db = connections[DEFAULT_DB_ALIAS]
+        pg_connection: Any = db.get_new_connection(db.get_connection_params())
+        try:
+            pg_connection.autocommit = True
+            with pg_connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.pg_channel}"')
+            while True:
+                if select.select([pg_connection], [], [], 5) == ([], [], []):
+                    continue
+                pg_connection.poll()
+                while pg_connection.notifies:
+                    notify: Any = pg_connection.notifies.pop(0)
+                    message: dict = json.loads(notify.payload)
+                    self.broker.publish(message["channel"], message["event"])
+        finally:
+            pg_connection.close()
+
+
+class EventHub:
+    def __init__(self) -> None:
+        self.broker: Broker = Broker()
+        self.bridge: PostgresNotifyBridge = PostgresNotifyBridge(self.broker)
+
+    @property
+    def uses_pg_notify(self) -> bool:
+        return getattr(settings, "EVENT_HUB_USE_PG_NOTIFY", False)
+
+    def subscribe(self, channel: str) -> Subscription:
+        if self.uses_pg_notify:
+            self.bridge.ensure_listening()
+        return self.broker.subscribe(channel)
+
+    def publish_on_commit(self, channel: str, event: dict, using: str = DEFAULT_DB_ALIAS) -> None:
+        if self.uses_pg_notify and using == DEFAULT_DB_ALIAS:
+            self.bridge.publish(channel, event, using=using)
+            return
+        if self.uses_pg_notify:
+            # Workers only listen on the default database, relay the event there once committed
+            transaction.on_commit(lambda: self.bridge.publish(channel, event), using=using)
+            return
+        transaction.on_commit(lambda: self.broker.publish(channel, event), using=using)
+
+
+event_hub: EventHub = EventHub()
@@ -17,6 +17,10 @@ class ErrorCode(IntEnum):
     empty_teams = 10001
     phrases_all_used = 10002
     any_round_still_ongoing = 10003
+    not_team_turn = 10004
+    idempotency_key_reused = 10005
+    game_archived = 10006
+    game_archive_unavailable = 10007
 
 
 class FieldErrorCode(IntEnum):
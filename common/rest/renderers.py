@@ -0,0 +1,9 @@
+from rest_framework import renderers
+
+from common.timings import measured
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    @measured("render")
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(data, accepted_media_type, renderer_context)
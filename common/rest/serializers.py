@@ -9,6 +9,8 @@ from rest_framework.serializers import Serializer
 from rest_framework.serializers import ValidationError as DRFValidationError
 from six import string_types
 
+from common.timings import measured
+
 from .exceptions import FieldErrorCode, ValidationError, ValidationErrorDetail
 
 
@@ -200,3 +202,15 @@ class PolymorphicSerializer(Serializer, Generic[T]):
                 code="invalid",
             )
         return data_type_value
+
+
+def _measure_serialization() -> None:
+    """
+    Times `.data` of every serializer as the serialize phase of the request, whether built by
+    the view or directly, e.g. the many=True ones of the dashboard.
+    """
+    data: property = BaseSerializer.data
+    BaseSerializer.data = property(measured("serialize")(data.fget))  # type: ignore
+
+
+_measure_serialization()
@@ -1,4 +1,4 @@
-from typing import Type
+from typing import Optional, Type
 
 from django.http import Http404
 from rest_framework.authentication import BaseAuthentication
@@ -10,9 +10,12 @@ from rest_framework.exceptions import (
     ValidationError,
 )
 from rest_framework.permissions import AllowAny, BasePermission, IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
 
+from common.dbrouting import get_game_shard, read_own_writes, routing_local
 from common.logger import log
+from common.timings import measure
 
 from .exceptions import ErrorCode, ErrorCodeException
 from .jwt import JWTTokenUserAuthentication
@@ -23,6 +26,12 @@ class BaseAPIViewMixin:
     authentication_classes: list[Type[BaseAuthentication]] = []
     permission_classes: list[Type[BasePermission]] = [AllowAny]
 
+    def initial(self, request: Request, *args, **kwargs) -> None:
+        with measure("auth"):
+            super().initial(request, *args, **kwargs)  # type: ignore
+        if request.user.is_authenticated:
+            read_own_writes(request.user.id)
+
     def generate_no_error_response(self, data: dict) -> Response:
         response_dict: dict = {"code": ErrorCode.no_error.value}
         if data:
@@ -35,8 +44,25 @@ class ActiveUserAPIViewMixin(BaseAPIViewMixin):
     permission_classes = [IsAuthenticated, IsActive]
 
 
+class GameShardViewMixin:
+    """Sends the queries of views under games/<game_id>/ to the shard of the game."""
+
+    def initial(self, request: Request, *args, **kwargs) -> None:
+        # Authenticated first, so that who may not see the game doesn't learn whether it exists
+        super().initial(request, *args, **kwargs)  # type: ignore
+        shard: Optional[str] = get_game_shard(kwargs["game_id"])
+        if shard is None:
+            raise ErrorCodeException(ErrorCode.resource_not_found)
+        routing_local.shard = shard
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)  # type: ignore
+        finally:
+            routing_local.shard = None
+
+
 def exception_handler(exc, context):
-    log.info("exception_handler|original exc=%s, context=%s|start", exc, context)
     converted_exception: ErrorCodeException
     if isinstance(exc, Http404):
         converted_exception = ErrorCodeException(
@@ -68,8 +94,11 @@ def exception_handler(exc, context):
         log.error(exc, exc_info=True)
         converted_exception = ErrorCodeException(ErrorCode.unknown)
 
-    log.info(
-        "exception_handler|Returning error, code=%s, error_details=%s|end",
+    # A child of the main logger, so that routine handled errors can be sampled on their own
+    log.getChild("exception_handler").info(
+        "exception_handler|original exc=%s, view=%s|Returning error, code=%s, error_details=%s",
+        exc,
+        type(context.get("view")).__name__,
         converted_exception.error_code,
         converted_exception.error_details,
     )
@@ -0,0 +1,127 @@
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+from threading import local
+from typing import Any, Callable, Iterator, Optional
+
+from django.db import connections
+from django.http import HttpRequest
+
+from common.logger import log
+
+PHASES: list[str] = ["auth", "db", "serialize", "render"]
+
+
+class RequestTimings:
+    def __init__(self) -> None:
+        self.started_at: float = time.perf_counter()
+        self.durations: dict[str, float] = {}
+        # Phases being measured, so that nested measures of one aren't counted twice
+        self.active_phases: set[str] = set()
+        self.query_count: int = 0
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.durations[phase] = self.durations.get(phase, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def to_milliseconds(self) -> dict[str, float]:
+        timings_ms: dict[str, float] = {
+            phase: round(self.durations.get(phase, 0.0) * 1000, 3) for phase in PHASES
+        }
+        timings_ms["total"] = round(self.elapsed() * 1000, 3)
+        return timings_ms
+
+    def to_server_timing(self, timings_ms: dict[str, float]) -> str:
+        metrics: list[str] = []
+        for phase, duration_ms in timings_ms.items():
+            metric: str = f"{phase};dur={duration_ms}"
+            if phase == "db":
+                metric += f';desc="{self.query_count} queries"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+
+class RequestTimingLocal(local):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)  # type: ignore
+        self.timings: Optional[RequestTimings] = None
+
+
+@contextmanager
+def measure(phase: str) -> Iterator[None]:
+    timings: Optional[RequestTimings] = request_timing_local.timings
+    if timings is None or phase in timings.active_phases:
+        yield
+        return
+    timings.active_phases.add(phase)
+    start: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.active_phases.discard(phase)
+        timings.add(phase, time.perf_counter() - start)
+
+
+def measured(phase: str) -> Callable:
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapped_func(*args, **kwargs):
+            with measure(phase):
+                return func(*args, **kwargs)
+
+        return wrapped_func
+
+    return decorator
+
+
+class QueryTimer:
+    def __init__(self, timings: RequestTimings) -> None:
+        self.timings: RequestTimings = timings
+
+    def __call__(self, execute: Callable, sql: str, params: Any, many: bool, context: dict) -> Any:
+        start: float = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.timings.query_count += 1
+            self.timings.add("db", time.perf_counter() - start)
+
+
+class RequestTimingMiddleware:
+    """
+    Splits the time of every request into authentication, database, serialization and
+    rendering, returns it as a Server-Timing header and logs it as one line.
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response: Callable = get_response
+
+    def __call__(self, request: HttpRequest) -> Any:
+        timings: RequestTimings = RequestTimings()
+        request_timing_local.timings = timings
+        try:
+            with ExitStack() as stack:
+                query_timer: QueryTimer = QueryTimer(timings)
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(query_timer))
+                response: Any = self.get_response(request)
+        finally:
+            request_timing_local.timings = None
+
+        timings_ms: dict[str, float] = timings.to_milliseconds()
+        response["Server-Timing"] = timings.to_server_timing(timings_ms)
+        log.data(
+            "request_timing|method=%s|path=%s|status=%s|queries=%s|%s",
+            request.method,
+            request.path,
+            response.status_code,
+            timings.query_count,
+            "|".join(f"{phase}_ms={duration_ms}" for phase, duration_ms in timings_ms.items()),
+            extra={"timings": timings_ms, "queries": timings.query_count},
+        )
+        return response
+
+
+request_timing_local: RequestTimingLocal = RequestTimingLocal()
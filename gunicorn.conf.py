@@ -0,0 +1,43 @@
+# Gunicorn configuration, picked up from the working directory by `gunicorn backend.wsgi`
+# pylint: disable=invalid-name
+import os
+import shutil
+
+worker_class = "gevent"
+
+# Workers keep their metrics in mmap-backed files here, see common/metrics.py
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/phrase-guess-metrics")
+
+
+def on_starting(server):
+    # Metrics files of a previous run would be aggregated together with the new ones
+    multiprocess_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(multiprocess_dir, ignore_errors=True)
+    os.makedirs(multiprocess_dir)
+
+
+def post_fork(server, worker):
+    # psycopg2 blocks in C, waiting on the database would stall every greenlet of the worker
+    from psycogreen.gevent import patch_psycopg  # pylint: disable=import-outside-toplevel
+
+    patch_psycopg()
+
+
+def post_worker_init(worker):
+    # Runs in every worker once the application is loaded, before it accepts requests
+    from backend.warmup import warm_up  # pylint: disable=import-outside-toplevel
+
+    warm_up()
+
+
+def worker_exit(server, worker):
+    # Write out the log records still queued before the worker goes away
+    from common.logger import shutdown_logger  # pylint: disable=import-outside-toplevel
+
+    shutdown_logger()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess  # pylint: disable=import-outside-toplevel
+
+    multiprocess.mark_process_dead(worker.pid)